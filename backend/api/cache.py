@@ -0,0 +1,84 @@
+"""
+响应缓存：进程内 TTL 缓存 + ETag 条件请求
+
+用于频繁读取、很少修改的只读接口（内容列表、内容详情、类型列表）。
+缓存的是序列化后的响应体，命中时无需再次查询和编码；
+条目记录写入时存储层的数据版本（ContentStore.version()），版本变化即失效，
+因此其他进程、命令行工具或 graph 直接写存储也不会读到旧数据。
+客户端携带的 If-None-Match 与 ETag 一致时直接返回 304，不传输响应体。
+"""
+import hashlib
+import time
+from typing import Hashable, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(body: bytes) -> str:
+    """根据响应体计算强 ETag"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_response(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    """
+    返回带 ETag 的 JSON 响应
+
+    请求头 If-None-Match 命中时返回 304（无响应体）
+    """
+    if etag is None:
+        etag = make_etag(body)
+    headers = {"ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    按命名空间组织、以数据版本校验的 TTL 缓存
+
+    条目为 (数据版本, 响应体, ETag)，读取时版本与当前版本不一致即视为失效；
+    TTL 只用于回收长期未访问的条目。只在事件循环线程中访问，无需加锁。
+    """
+
+    def __init__(self, ttl: float = 30.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[tuple, tuple[float, Hashable, bytes, str]] = {}
+
+    def get(self, namespace: str, key: Hashable, version: Hashable) -> Optional[tuple[bytes, str]]:
+        """获取未过期且数据版本一致的 (响应体, ETag)"""
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at, entry_version, body, etag = entry
+        if entry_version != version or expires_at < time.monotonic():
+            self._entries.pop((namespace, key), None)
+            return None
+        return body, etag
+
+    def set(self, namespace: str, key: Hashable, version: Hashable, body: bytes) -> str:
+        """
+        写入响应体，返回其 ETag
+
+        version 须在查询数据之前读取：查询期间发生的写入会使下次读取时版本不一致而失效
+        """
+        if len(self._entries) >= self.maxsize:
+            self._evict()
+        etag = make_etag(body)
+        self._entries[(namespace, key)] = (time.monotonic() + self.ttl, version, body, etag)
+        return etag
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def _evict(self) -> None:
+        """先清理过期条目，仍然超限则丢弃最早写入的一半"""
+        now = time.monotonic()
+        for cache_key in [k for k, v in self._entries.items() if v[0] < now]:
+            del self._entries[cache_key]
+        if len(self._entries) >= self.maxsize:
+            for cache_key in list(self._entries)[: self.maxsize // 2]:
+                del self._entries[cache_key]
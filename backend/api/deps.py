@@ -1,15 +1,27 @@
 """
 依赖注入：提供 Runtime 单例
 """
-from functools import lru_cache
+from typing import Annotated, Optional
+
+from fastapi import Depends
+
 from core import Runtime
 
 
-@lru_cache()
+_runtime: Optional[Runtime] = None
+
+
 def get_runtime() -> Runtime:
     """
     获取 Runtime 单例
     
-    使用 lru_cache 确保整个应用生命周期内只有一个实例
+    首次调用时创建，之后直接返回模块级实例（无 lru_cache 的哈希与加锁开销）
     """
-    return Runtime()
+    global _runtime
+    if _runtime is None:
+        _runtime = Runtime()
+    return _runtime
+
+
+# 路由参数使用：runtime: RuntimeDep
+RuntimeDep = Annotated[Runtime, Depends(get_runtime)]
@@ -5,22 +5,27 @@ FastAPI 应用入口
     cd backend
     uvicorn api.main:app --reload --port 8000
 
+    在仓库根目录启动时用 --app-dir 指定 backend 目录：
+    uvicorn api.main:app --app-dir backend --port 8000
+
+生产环境（uvloop + httptools，关闭访问日志）：
+    uvicorn api.main:app --port 8000 --loop uvloop --http httptools --no-access-log
+
+    uvicorn 只支持 HTTP/1.1，浏览器对同一来源最多保持约 6 个 SSE 连接；
+    需要更多并发流时，在前面放置支持 HTTP/2 的反向代理（如 nginx http2）。
+
 访问：
     API 文档: http://localhost:8000/docs
     前端界面: http://localhost:8000/
 """
-import sys
 from pathlib import Path
 
-# 确保 backend 目录在 Python 路径中
-backend_dir = Path(__file__).parent.parent
-if str(backend_dir) not in sys.path:
-    sys.path.insert(0, str(backend_dir))
-
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
+
+from core import ConversationNotFoundError
 
 from .routes import conversations_router, chat_router, state_router, contents_router
 
@@ -30,6 +35,7 @@ app = FastAPI(
     title="AgentTest API",
     description="LangGraph 聊天框架 API",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS 配置（开发阶段允许所有来源）
@@ -41,6 +47,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# 会话不存在 → 404
+@app.exception_handler(ConversationNotFoundError)
+async def conversation_not_found_handler(request: Request, exc: ConversationNotFoundError):
+    """Runtime 在同一次调用中完成存在性检查，会话不存在时统一返回 404"""
+    return ORJSONResponse(status_code=404, content={"detail": "会话不存在"})
+
+
 # 注册 API 路由
 app.include_router(conversations_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
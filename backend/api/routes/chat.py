@@ -2,51 +2,144 @@
 聊天路由：发送消息、流式响应、重新生成
 """
 import asyncio
-import json
-from typing import AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator
 
-from fastapi import APIRouter, HTTPException, Depends
+import orjson
+from fastapi import APIRouter, HTTPException, Request
 from sse_starlette.sse import EventSourceResponse
 
-from ..deps import get_runtime
+from core import ConversationNotFoundError
+
+from ..cache import etag_response, make_etag
+from ..deps import RuntimeDep
 from ..schemas import (
     ChatRequest,
     ChatResponse,
     MessageListResponse,
-    Message,
     MessageEdit,
     SuccessResponse,
 )
-from core import Runtime
 
 router = APIRouter(prefix="/conversations/{conversation_id}", tags=["chat"])
 
+# 流式片段合并窗口（秒）：在该时间内到达的片段合并为一个 SSE 事件
+STREAM_FLUSH_INTERVAL = 0.02
+
+# SSE 响应头：禁止反向代理（nginx 等）缓冲和缓存事件流
+_SSE_HEADERS = {
+    "X-Accel-Buffering": "no",
+    "Cache-Control": "no-cache",
+}
+
+# 心跳间隔（秒）：长时间生成时保持连接，避免被代理的空闲超时断开
+SSE_PING_INTERVAL = 15
+
+# 同时进行的生成数量上限，超出的请求排队等待
+MAX_CONCURRENT_GENERATIONS = 8
+
+# 生成专用线程池，避免 LLM 调用占满默认线程池、阻塞 asyncio.to_thread 的数据库读写
+_generation_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_GENERATIONS,
+    thread_name_prefix="generation",
+)
+_admission = asyncio.Condition()
+_active_generations = 0
+
+
+@asynccontextmanager
+async def _admit():
+    """准入控制：等待空闲名额，退出时释放并唤醒一个等待者"""
+    global _active_generations
+    async with _admission:
+        await _admission.wait_for(lambda: _active_generations < MAX_CONCURRENT_GENERATIONS)
+        _active_generations += 1
+    try:
+        yield
+    finally:
+        async with _admission:
+            _active_generations -= 1
+            _admission.notify(1)
+
+
+# chunk 事件的固定前后缀，只需编码变化的内容字符串
+_CHUNK_PREFIX = '{"type":"chunk","content":'
+_CHUNK_SUFFIX = "}"
+
+
+def _encode_event(payload: dict) -> str:
+    """编码 SSE 数据（orjson 原生输出 UTF-8，无需 ensure_ascii=False）"""
+    return orjson.dumps(payload).decode()
+
+
+def _encode_chunk(content: str) -> str:
+    """编码 chunk 事件：只编码内容字符串，一次拼接出完整 JSON"""
+    return f"{_CHUNK_PREFIX}{orjson.dumps(content).decode()}{_CHUNK_SUFFIX}"
+
+
+async def _stream_events(events: AsyncIterator[tuple[str, Any]]) -> AsyncGenerator[str, None]:
+    """将 Runtime 的异步事件流转换为 SSE 数据帧，片段到达即发送"""
+    try:
+        async with _admit():
+            async for kind, payload in events:
+                if kind == "chunk":
+                    yield _encode_chunk(payload)
+                else:
+                    # 发送完成信号
+                    yield _encode_event({
+                        "type": "done",
+                        "output": payload.get("last_output", ""),
+                        "mood": payload.get("mood"),
+                        "thought": payload.get("inner_thought"),
+                    })
+    except Exception as e:
+        yield _encode_event({"type": "error", "error": str(e)})
+
+
+def _sse_response(events: AsyncIterator[tuple[str, Any]]) -> EventSourceResponse:
+    """构造 SSE 响应"""
+    return EventSourceResponse(
+        _stream_events(events),
+        headers=_SSE_HEADERS,
+        ping=SSE_PING_INTERVAL,
+    )
+
+
+def _encode_messages(messages: list[dict]) -> tuple[bytes, str]:
+    """
+    编码消息列表响应，返回 (响应体, ETag)
+    
+    直接在事件循环中执行：构造字典和 orjson 编码都持有 GIL，放到线程里同样会卡住事件循环；
+    放到进程池则要先 pickle 整个消息列表，开销与编码本身相当
+    """
+    body = orjson.dumps({
+        "messages": [
+            {"role": m.get("role", ""), "content": m.get("content", "")}
+            for m in messages
+        ],
+        "total": len(messages),
+    })
+    return body, make_etag(body)
+
 
 @router.get("/messages", response_model=MessageListResponse)
 async def get_messages(
     conversation_id: str,
-    runtime: Runtime = Depends(get_runtime),
+    request: Request,
+    runtime: RuntimeDep,
 ):
-    """获取消息历史"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    messages = runtime.get_history(conversation_id)
-    return MessageListResponse(
-        messages=[
-            Message(role=m.get("role", ""), content=m.get("content", ""))
-            for m in messages
-        ],
-        total=len(messages),
-    )
+    """获取消息历史（响应带 ETag，内容未变化时返回 304）"""
+    messages = await asyncio.to_thread(runtime.get_history, conversation_id)
+    body, etag = _encode_messages(messages)
+    return etag_response(request, body, etag)
 
 
 @router.post("/chat")
 async def chat(
     conversation_id: str,
     data: ChatRequest,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """
     发送消息（SSE 流式响应）
@@ -56,66 +149,38 @@ async def chat(
     - data: {"type": "done", "output": "...", "mood": "...", "thought": "..."} - 完成
     - data: {"type": "error", "error": "..."} - 错误
     """
-    conv = runtime.get_conversation(conversation_id)
+    conv = await asyncio.to_thread(runtime.get_conversation, conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="会话不存在")
     
-    async def generate() -> AsyncGenerator[str, None]:
-        chunks = []
-        
-        def stream_callback(chunk: str):
-            chunks.append(chunk)
-        
-        try:
-            # 在线程池中运行同步代码
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                lambda: runtime.run(conversation_id, data.message, stream_callback=stream_callback)
-            )
-            
-            # 逐个发送收集到的 chunks
-            for chunk in chunks:
-                yield json.dumps({"type": "chunk", "content": chunk}, ensure_ascii=False)
-                await asyncio.sleep(0)  # 让出控制权
-            
-            # 发送完成信号
-            yield json.dumps({
-                "type": "done",
-                "output": result.get("last_output", ""),
-                "mood": result.get("mood"),
-                "thought": result.get("inner_thought"),
-            }, ensure_ascii=False)
-            
-        except Exception as e:
-            yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False)
-    
-    return EventSourceResponse(generate())
+    events = runtime.arun(
+        conversation_id, data.message,
+        flush_interval=STREAM_FLUSH_INTERVAL, executor=_generation_executor,
+    )
+    return _sse_response(events)
 
 
 @router.post("/chat/sync", response_model=ChatResponse)
 async def chat_sync(
     conversation_id: str,
     data: ChatRequest,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """发送消息（非流式，等待完整响应）"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: runtime.run(conversation_id, data.message)
-        )
+        async with _admit():
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                _generation_executor, runtime.run, conversation_id, data.message
+            )
         
         return ChatResponse(
             output=result.get("last_output", ""),
             mood=result.get("mood"),
             inner_thought=result.get("inner_thought"),
         )
+    except ConversationNotFoundError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -123,43 +188,20 @@ async def chat_sync(
 @router.post("/regenerate")
 async def regenerate(
     conversation_id: str,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """
     重新生成最后一条回复（SSE 流式响应）
     """
-    conv = runtime.get_conversation(conversation_id)
+    conv = await asyncio.to_thread(runtime.get_conversation, conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="会话不存在")
     
-    async def generate() -> AsyncGenerator[str, None]:
-        chunks = []
-        
-        def stream_callback(chunk: str):
-            chunks.append(chunk)
-        
-        try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                lambda: runtime.regenerate(conversation_id, stream_callback=stream_callback)
-            )
-            
-            for chunk in chunks:
-                yield json.dumps({"type": "chunk", "content": chunk}, ensure_ascii=False)
-                await asyncio.sleep(0)
-            
-            yield json.dumps({
-                "type": "done",
-                "output": result.get("last_output", ""),
-                "mood": result.get("mood"),
-                "thought": result.get("inner_thought"),
-            }, ensure_ascii=False)
-            
-        except Exception as e:
-            yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False)
-    
-    return EventSourceResponse(generate())
+    events = runtime.aregenerate(
+        conversation_id,
+        flush_interval=STREAM_FLUSH_INTERVAL, executor=_generation_executor,
+    )
+    return _sse_response(events)
 
 
 @router.put("/messages/{message_index}", response_model=SuccessResponse)
@@ -167,14 +209,10 @@ async def edit_message(
     conversation_id: str,
     message_index: int,
     data: MessageEdit,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """编辑指定消息"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    success = runtime.edit_message(conversation_id, message_index, data.content)
+    success = await asyncio.to_thread(runtime.edit_message, conversation_id, message_index, data.content)
     if not success:
         raise HTTPException(status_code=400, detail="编辑失败，消息索引无效")
     
@@ -185,14 +223,10 @@ async def edit_message(
 async def delete_message(
     conversation_id: str,
     message_index: int,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """删除指定消息"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    success = runtime.delete_message(conversation_id, message_index)
+    success = await asyncio.to_thread(runtime.delete_message, conversation_id, message_index)
     if not success:
         raise HTTPException(status_code=400, detail="删除失败，消息索引无效")
     
@@ -3,14 +3,21 @@
 
 支持角色卡、预设、世界观、正则脚本等内容的 CRUD 操作
 """
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends, Query
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable, Optional
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
-from ..deps import get_runtime
-from ..schemas import SuccessResponse
 from core import Runtime
 
+from ..cache import ResponseCache, etag_response, make_etag
+from ..deps import RuntimeDep
+from ..schemas import SuccessResponse
+
 router = APIRouter(prefix="/contents", tags=["contents"])
 
 
@@ -95,96 +102,162 @@ CONTENT_TYPES = {
     },
 }
 
+# 合法类型集合与 /types 响应体在导入时计算一次
+_CONTENT_TYPE_KEYS = frozenset(CONTENT_TYPES)
+
+_TYPES_RESPONSE = {
+    "types": [
+        {
+            "type": key,
+            "name": value["name"],
+            "description": value["description"],
+            "schema_hint": value["schema_hint"],
+        }
+        for key, value in CONTENT_TYPES.items()
+    ]
+}
+_TYPES_BODY = orjson.dumps(_TYPES_RESPONSE)
+_TYPES_ETAG = make_etag(_TYPES_BODY)
+
+# 列表/详情响应缓存，按内容类型划分命名空间，存储层数据版本变化后失效
+_cache = ResponseCache(ttl=30.0)
+
+# 读取数据版本的专用单线程池：与其他存储调用一样不在事件循环中执行查询，
+# 又保证总在同一线程（同一 SQLite 连接）读取，data_version 只在同一连接内可比较
+_version_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content-version")
+
+
+async def _store_version(runtime: Runtime) -> Optional[Hashable]:
+    """在 _version_executor 中读取内容存储的数据版本"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_version_executor, runtime.contents.version)
+
+
+def _cached_body(request: Request, content_type: str, cache_key: tuple,
+                 version) -> Optional[Response]:
+    """缓存命中时返回响应；存储层不提供数据版本（None）时不走缓存"""
+    if version is None:
+        return None
+    cached = _cache.get(content_type, cache_key, version)
+    return etag_response(request, *cached) if cached else None
+
+
+def _store_body(request: Request, content_type: str, cache_key: tuple,
+                version, body: bytes) -> Response:
+    """缓存响应体（有数据版本时）并返回带 ETag 的响应"""
+    etag = _cache.set(content_type, cache_key, version, body) if version is not None else None
+    return etag_response(request, body, etag)
+
+
+def _to_response(item: dict) -> dict:
+    """
+    把存储层返回的内容转换为 ContentResponse 结构的字典
+    
+    存储层数据已符合模型定义，直接返回字典可以省去 Pydantic 的构造和二次校验。
+    """
+    created_at = item.get("created_at")
+    updated_at = item.get("updated_at")
+    return {
+        "id": item["id"],
+        "type": item["type"],
+        "data": item["data"],
+        "scope": item.get("scope", "global"),
+        "tags": item.get("tags"),
+        "created_at": str(created_at) if created_at else None,
+        "updated_at": str(updated_at) if updated_at else None,
+    }
+
+
+def _encode_items(items: list[dict], **fields) -> bytes:
+    """
+    序列化列表响应：逐条编码后拼接为 {"items": [...], "total": N, ...}
+    
+    不构造中间的响应字典列表，峰值内存只有各条目的编码结果。
+    """
+    parts = [b'{"items":[']
+    for i, item in enumerate(items):
+        if i:
+            parts.append(b",")
+        parts.append(orjson.dumps(_to_response(item), option=orjson.OPT_NON_STR_KEYS))
+    # 其余字段编码为对象后去掉开头的 "{"，接在 items 数组之后
+    parts.append(b"],")
+    parts.append(orjson.dumps({"total": len(items), **fields})[1:])
+    return b"".join(parts)
+
 
 # ============================================================
 # API 端点
 # ============================================================
 
 @router.get("/types")
-async def list_content_types():
+async def list_content_types(request: Request):
     """列出支持的内容类型"""
-    return {
-        "types": [
-            {
-                "type": key,
-                "name": value["name"],
-                "description": value["description"],
-                "schema_hint": value["schema_hint"],
-            }
-            for key, value in CONTENT_TYPES.items()
-        ]
-    }
+    return etag_response(request, _TYPES_BODY, _TYPES_ETAG)
 
 
 @router.get("/{content_type}", response_model=ContentListResponse)
 async def list_contents(
     content_type: str,
+    request: Request,
+    runtime: RuntimeDep,
     scope: str = Query(default="global", description="作用域"),
-    tags: Optional[str] = Query(default=None, description="标签筛选（逗号分隔）"),
-    runtime: Runtime = Depends(get_runtime),
+    tags: Optional[list[str]] = Query(default=None, description="标签筛选（可重复，如 ?tags=a&tags=b）"),
 ):
     """列出指定类型的所有内容"""
-    if content_type not in CONTENT_TYPES:
+    if content_type not in _CONTENT_TYPE_KEYS:
         raise HTTPException(status_code=400, detail=f"不支持的内容类型: {content_type}")
     
-    tag_list = tags.split(",") if tags else None
-    items = runtime.contents.list(content_type, scope=scope, tags=tag_list)
+    # 标签按"包含任一"筛选，与顺序无关，排序后作为缓存键
+    cache_key = ("list", scope, tuple(sorted(tags)) if tags else None)
+    version = await _store_version(runtime)
+    cached = _cached_body(request, content_type, cache_key, version)
+    if cached:
+        return cached
     
-    return ContentListResponse(
-        items=[
-            ContentResponse(
-                id=item["id"],
-                type=item["type"],
-                data=item["data"],
-                scope=item.get("scope", "global"),
-                tags=item.get("tags"),
-                created_at=str(item.get("created_at")) if item.get("created_at") else None,
-                updated_at=str(item.get("updated_at")) if item.get("updated_at") else None,
-            )
-            for item in items
-        ],
-        total=len(items),
-        type=content_type,
-    )
+    items = await asyncio.to_thread(runtime.contents.list, content_type, scope=scope, tags=tags)
+    
+    body = _encode_items(items, type=content_type)
+    return _store_body(request, content_type, cache_key, version, body)
 
 
 @router.get("/{content_type}/{content_id}", response_model=ContentResponse)
 async def get_content(
     content_type: str,
     content_id: str,
+    request: Request,
+    runtime: RuntimeDep,
     scope: str = Query(default="global"),
-    runtime: Runtime = Depends(get_runtime),
 ):
     """获取单个内容"""
-    if content_type not in CONTENT_TYPES:
+    if content_type not in _CONTENT_TYPE_KEYS:
         raise HTTPException(status_code=400, detail=f"不支持的内容类型: {content_type}")
     
-    item = runtime.contents.get(content_type, content_id, scope=scope)
+    cache_key = ("get", scope, content_id)
+    version = await _store_version(runtime)
+    cached = _cached_body(request, content_type, cache_key, version)
+    if cached:
+        return cached
+    
+    item = await asyncio.to_thread(runtime.contents.get, content_type, content_id, scope=scope)
     if not item:
         raise HTTPException(status_code=404, detail="内容不存在")
     
-    return ContentResponse(
-        id=item["id"],
-        type=item["type"],
-        data=item["data"],
-        scope=item.get("scope", "global"),
-        tags=item.get("tags"),
-        created_at=str(item.get("created_at")) if item.get("created_at") else None,
-        updated_at=str(item.get("updated_at")) if item.get("updated_at") else None,
-    )
+    body = orjson.dumps(_to_response(item))
+    return _store_body(request, content_type, cache_key, version, body)
 
 
 @router.post("/{content_type}", response_model=ContentResponse)
 async def create_content(
     content_type: str,
     data: ContentCreate,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """创建或更新内容（Upsert）"""
-    if content_type not in CONTENT_TYPES:
+    if content_type not in _CONTENT_TYPE_KEYS:
         raise HTTPException(status_code=400, detail=f"不支持的内容类型: {content_type}")
     
-    runtime.contents.save(
+    await asyncio.to_thread(
+        runtime.contents.save,
         type=content_type,
         id=data.id,
         data=data.data,
@@ -193,17 +266,9 @@ async def create_content(
     )
     
     # 重新获取保存后的数据
-    item = runtime.contents.get(content_type, data.id, scope=data.scope)
+    item = await asyncio.to_thread(runtime.contents.get, content_type, data.id, scope=data.scope)
     
-    return ContentResponse(
-        id=item["id"],
-        type=item["type"],
-        data=item["data"],
-        scope=item.get("scope", "global"),
-        tags=item.get("tags"),
-        created_at=str(item.get("created_at")) if item.get("created_at") else None,
-        updated_at=str(item.get("updated_at")) if item.get("updated_at") else None,
-    )
+    return ORJSONResponse(_to_response(item))
 
 
 @router.put("/{content_type}/{content_id}", response_model=ContentResponse)
@@ -211,18 +276,19 @@ async def update_content(
     content_type: str,
     content_id: str,
     data: ContentCreate,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """更新内容"""
-    if content_type not in CONTENT_TYPES:
+    if content_type not in _CONTENT_TYPE_KEYS:
         raise HTTPException(status_code=400, detail=f"不支持的内容类型: {content_type}")
     
     # 检查是否存在
-    existing = runtime.contents.get(content_type, content_id, scope=data.scope)
+    existing = await asyncio.to_thread(runtime.contents.get, content_type, content_id, scope=data.scope)
     if not existing:
         raise HTTPException(status_code=404, detail="内容不存在")
     
-    runtime.contents.save(
+    await asyncio.to_thread(
+        runtime.contents.save,
         type=content_type,
         id=content_id,
         data=data.data,
@@ -230,31 +296,23 @@ async def update_content(
         tags=data.tags,
     )
     
-    item = runtime.contents.get(content_type, content_id, scope=data.scope)
+    item = await asyncio.to_thread(runtime.contents.get, content_type, content_id, scope=data.scope)
     
-    return ContentResponse(
-        id=item["id"],
-        type=item["type"],
-        data=item["data"],
-        scope=item.get("scope", "global"),
-        tags=item.get("tags"),
-        created_at=str(item.get("created_at")) if item.get("created_at") else None,
-        updated_at=str(item.get("updated_at")) if item.get("updated_at") else None,
-    )
+    return ORJSONResponse(_to_response(item))
 
 
 @router.delete("/{content_type}/{content_id}", response_model=SuccessResponse)
 async def delete_content(
     content_type: str,
     content_id: str,
+    runtime: RuntimeDep,
     scope: str = Query(default="global"),
-    runtime: Runtime = Depends(get_runtime),
 ):
     """删除内容"""
-    if content_type not in CONTENT_TYPES:
+    if content_type not in _CONTENT_TYPE_KEYS:
         raise HTTPException(status_code=400, detail=f"不支持的内容类型: {content_type}")
     
-    success = runtime.contents.delete(content_type, content_id, scope=scope)
+    success = await asyncio.to_thread(runtime.contents.delete, content_type, content_id, scope=scope)
     if not success:
         raise HTTPException(status_code=404, detail="内容不存在")
     
@@ -265,26 +323,13 @@ async def delete_content(
 async def search_contents(
     content_type: str,
     keyword: str,
+    runtime: RuntimeDep,
     scope: str = Query(default="global"),
-    runtime: Runtime = Depends(get_runtime),
 ):
     """搜索内容"""
-    if content_type not in CONTENT_TYPES:
+    if content_type not in _CONTENT_TYPE_KEYS:
         raise HTTPException(status_code=400, detail=f"不支持的内容类型: {content_type}")
     
-    items = runtime.contents.search(content_type, keyword, scope=scope)
+    items = await asyncio.to_thread(runtime.contents.search, content_type, keyword, scope=scope)
     
-    return {
-        "items": [
-            ContentResponse(
-                id=item["id"],
-                type=item["type"],
-                data=item["data"],
-                scope=item.get("scope", "global"),
-                tags=item.get("tags"),
-            )
-            for item in items
-        ],
-        "total": len(items),
-        "keyword": keyword,
-    }
+    return Response(content=_encode_items(items, keyword=keyword), media_type="application/json")
@@ -1,95 +1,79 @@
 """
 会话管理路由
 """
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from typing import Optional
 
-from ..deps import get_runtime
+from fastapi import APIRouter, HTTPException, Query, Response
+from pydantic import TypeAdapter
+
+from ..deps import RuntimeDep
 from ..schemas import (
     ConversationCreate,
     ConversationResponse,
     ConversationListResponse,
     SuccessResponse,
 )
-from core import Runtime
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
 
+# 列表校验与序列化整体交给 pydantic-core 完成，不逐条构造模型
+_CONV_LIST_ADAPTER = TypeAdapter(ConversationListResponse)
+
 
 @router.get("", response_model=ConversationListResponse)
-async def list_conversations(runtime: Runtime = Depends(get_runtime)):
-    """列出所有会话"""
-    conversations = runtime.list_conversations()
-    return ConversationListResponse(
-        conversations=[
-            ConversationResponse(
-                id=c["id"],
-                title=c.get("title", ""),
-                graph_name=c.get("graph_name", ""),
-                thread_id=c.get("thread_id", ""),
-                created_at=c.get("created_at"),
-                updated_at=c.get("updated_at"),
-                content_refs=c.get("content_refs"),
-            )
-            for c in conversations
-        ],
-        total=len(conversations),
-    )
+async def list_conversations(
+    runtime: RuntimeDep,
+    limit: Optional[int] = Query(default=None, ge=1, description="只返回最近更新的 N 个会话"),
+):
+    """列出会话（按更新时间降序）"""
+    conversations = await asyncio.to_thread(runtime.list_conversations, limit)
+    validated = _CONV_LIST_ADAPTER.validate_python({
+        "conversations": conversations,
+        "total": len(conversations),
+    })
+    return Response(content=_CONV_LIST_ADAPTER.dump_json(validated), media_type="application/json")
 
 
 @router.post("", response_model=ConversationResponse)
 async def create_conversation(
     data: ConversationCreate,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """创建新会话"""
-    conv_id = runtime.create_conversation(
+    conv_id = await asyncio.to_thread(
+        runtime.create_conversation,
         graph_name=data.graph_name,
         title=data.title,
         content_refs=data.content_refs,
     )
-    conv = runtime.get_conversation(conv_id)
+    conv = await asyncio.to_thread(runtime.get_conversation, conv_id)
     if not conv:
         raise HTTPException(status_code=500, detail="创建会话失败")
     
-    return ConversationResponse(
-        id=conv["id"],
-        title=conv.get("title", ""),
-        graph_name=conv.get("graph_name", ""),
-        thread_id=conv.get("thread_id", ""),
-        created_at=conv.get("created_at"),
-        updated_at=conv.get("updated_at"),
-        content_refs=conv.get("content_refs"),
-    )
+    return ConversationResponse.model_validate(conv)
 
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: str,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """获取会话详情"""
-    conv = runtime.get_conversation(conversation_id)
+    conv = await asyncio.to_thread(runtime.get_conversation, conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="会话不存在")
     
-    return ConversationResponse(
-        id=conv["id"],
-        title=conv.get("title", ""),
-        graph_name=conv.get("graph_name", ""),
-        thread_id=conv.get("thread_id", ""),
-        created_at=conv.get("created_at"),
-        updated_at=conv.get("updated_at"),
-        content_refs=conv.get("content_refs"),
-    )
+    return ConversationResponse.model_validate(conv)
 
 
 @router.delete("/{conversation_id}", response_model=SuccessResponse)
 async def delete_conversation(
     conversation_id: str,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """删除会话"""
-    success = runtime.delete_conversation(conversation_id)
+    success = await asyncio.to_thread(runtime.delete_conversation, conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail="会话不存在")
     
@@ -97,7 +81,7 @@ async def delete_conversation(
 
 
 @router.delete("", response_model=SuccessResponse)
-async def clear_all_conversations(runtime: Runtime = Depends(get_runtime)):
+async def clear_all_conversations(runtime: RuntimeDep):
     """清空所有会话"""
-    count = runtime.clear_all_conversations()
+    count = await asyncio.to_thread(runtime.clear_all_conversations)
     return SuccessResponse(message=f"已删除 {count} 个会话")
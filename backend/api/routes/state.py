@@ -1,11 +1,13 @@
 """
 状态管理路由
 """
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
 
-from ..deps import get_runtime
+from fastapi import APIRouter, HTTPException, Request
+
+from ..cache import etag_response
+from ..deps import RuntimeDep
 from ..schemas import StateResponse, StateEditRequest, SuccessResponse
-from core import Runtime
 
 router = APIRouter(prefix="/conversations/{conversation_id}", tags=["state"])
 
@@ -13,32 +15,23 @@ router = APIRouter(prefix="/conversations/{conversation_id}", tags=["state"])
 @router.get("/state", response_model=StateResponse)
 async def get_state(
     conversation_id: str,
-    runtime: Runtime = Depends(get_runtime),
+    request: Request,
+    runtime: RuntimeDep,
 ):
-    """获取完整状态"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    state = runtime.get_state(conversation_id)
-    if state is None:
-        return StateResponse(state={})
-    
-    return StateResponse(state=state)
+    """获取完整状态（响应带 ETag，内容未变化时返回 304）"""
+    state = await asyncio.to_thread(runtime.get_state, conversation_id)
+    body = StateResponse(state=state or {}).model_dump_json().encode()
+    return etag_response(request, body)
 
 
 @router.put("/state", response_model=SuccessResponse)
 async def edit_state(
     conversation_id: str,
     data: StateEditRequest,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """编辑状态字段"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    success = runtime.edit_state(conversation_id, data.updates)
+    success = await asyncio.to_thread(runtime.edit_state, conversation_id, data.updates)
     if not success:
         raise HTTPException(status_code=400, detail="编辑失败")
     
@@ -48,15 +41,11 @@ async def edit_state(
 @router.get("/state/history")
 async def get_state_history(
     conversation_id: str,
+    runtime: RuntimeDep,
     limit: int = 10,
-    runtime: Runtime = Depends(get_runtime),
 ):
     """获取状态快照历史"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    history = runtime.get_state_history(conversation_id, limit=limit)
+    history = await asyncio.to_thread(runtime.get_state_history, conversation_id, limit=limit)
     return {"history": history, "total": len(history)}
 
 
@@ -64,12 +53,8 @@ async def get_state_history(
 async def rollback_state(
     conversation_id: str,
     checkpoint_id: str,
-    runtime: Runtime = Depends(get_runtime),
+    runtime: RuntimeDep,
 ):
     """回滚到指定快照"""
-    conv = runtime.get_conversation(conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="会话不存在")
-    
-    state = runtime.rollback_to(conversation_id, checkpoint_id)
+    state = await asyncio.to_thread(runtime.rollback_to, conversation_id, checkpoint_id)
     return StateResponse(state=state)
@@ -20,9 +20,9 @@ class ConversationCreate(BaseModel):
 class ConversationResponse(BaseModel):
     """会话响应"""
     id: str
-    title: str
-    graph_name: str
-    thread_id: str
+    title: str = ""
+    graph_name: str = ""
+    thread_id: str = ""
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     content_refs: Optional[dict] = None
@@ -1,19 +1,97 @@
 """
 CLI 聊天入口：从 main.py 拆出，便于日常使用
 """
-import json
 import sys
 from pathlib import Path
 
-# 确保 backend 目录在 Python 路径中
-backend_dir = Path(__file__).resolve().parent.parent
-if str(backend_dir) not in sys.path:
-    sys.path.insert(0, str(backend_dir))
+# 以脚本方式运行（python cli/xxx.py）时才需要把 backend 目录加入 Python 路径；
+# 以模块方式运行（python -m cli.xxx）时 __package__ 非空，backend 已在路径中
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from core import Runtime
 from core.config import get_config
 
 
+class StreamPrinter:
+    """
+    流式输出缓冲：片段先写入缓冲区，遇到换行或累计超过 flush_size 字节时才写出
+
+    直接写 sys.stdout.buffer，省去文本层的逐次编码和每个片段一次的 flush。
+    """
+
+    def __init__(self, flush_size: int = 256):
+        self.flush_size = flush_size
+        self._buf = bytearray()
+        self._out = getattr(sys.stdout, "buffer", None)
+
+    def __call__(self, chunk: str):
+        if self._out is None:
+            print(chunk, end="", flush=True)
+            return
+        self._buf.extend(chunk.encode("utf-8"))
+        if "\n" in chunk or len(self._buf) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """写出缓冲区中的全部内容"""
+        if self._buf:
+            self._out.write(self._buf)
+            self._out.flush()
+            self._buf.clear()
+
+
+def _read_line(prompt: str = "") -> str:
+    """
+    读取一行用户输入
+
+    终端下直接从底层 stdin 逐字节读取（read1），不经过文本层的行缓冲；
+    非终端（管道、重定向）时退回 input()。读到 EOF 时与 input() 一样抛出 EOFError。
+    """
+    stdin = sys.stdin
+    raw = getattr(getattr(stdin, "buffer", None), "raw", None)
+    if raw is None or not stdin.isatty():
+        return input(prompt)
+
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    buf = bytearray()
+    while True:
+        ch = raw.read1(1) if hasattr(raw, "read1") else raw.read(1)
+        if not ch:
+            if not buf:
+                raise EOFError
+            break
+        if ch == b"\n":
+            break
+        buf += ch
+    return buf.decode("utf-8", "replace").rstrip("\r")
+
+
+def _dump_state(state: dict) -> bytes:
+    """格式化 state 为缩进 JSON（UTF-8 字节），无法序列化的值转为字符串"""
+    import orjson  # 只有 /state、/export 用到，延迟导入
+
+    return orjson.dumps(
+        state,
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+        default=str,
+    )
+
+
+# 会话历史缓存：/history、/edit、/delete 复用，会话被修改后失效
+_history_cache: dict[str, list] = {}
+
+
+def _history(runtime: Runtime, conv_id: str) -> list:
+    """获取对话历史，命中缓存时不再读取 checkpoint"""
+    messages = _history_cache.get(conv_id)
+    if messages is None:
+        messages = runtime.get_history(conv_id)
+        _history_cache[conv_id] = messages
+    return messages
+
+
 def main():
     """主函数"""
     runtime = Runtime()
@@ -22,7 +100,7 @@ def main():
     print("LangGraph 聊天框架演示")
     print("=" * 50)
     print()
-    mode = input("选择模式 (1 新建 / 2 历史，默认1): ").strip() or "1"
+    mode = _read_line("选择模式 (1 新建 / 2 历史，默认1): ").strip() or "1"
     if mode == "2":
         conv_id, graph_name = _select_conversation(runtime)
         if not conv_id:
@@ -36,7 +114,7 @@ def main():
         print()
 
         # 选择图
-        choice = input("选择图 (1/2/3/4，默认1): ").strip() or "1"
+        choice = _read_line("选择图 (1/2/3/4，默认1): ").strip() or "1"
         graph_map = {
             "1": "default",
             "2": "roleplay",
@@ -49,7 +127,7 @@ def main():
         content_refs = None
         if graph_name == "with_worldinfo":
             # 加载 TestBook 世界观条目作为本次会话的 world_info
-            testbook_items = runtime.contents.list("world_info", tags=["testbook"])
+            testbook_items = runtime.contents.list("world_info", tags=("testbook",))
             testbook_ids = [item["id"] for item in testbook_items]
             content_refs = {"world_info": testbook_ids}
             if not testbook_ids:
@@ -87,8 +165,11 @@ def main():
 
     last_state = {}  # 保存最后一次的 state 用于调试
 
+    # 会话期间配置不变，循环外读取一次
+    stream_mode = get_config().llm.stream
+
     while True:
-        user_input = input("你: ").strip()
+        user_input = _read_line("你: ").strip()
 
         if user_input.lower() == "quit":
             print("再见！")
@@ -99,26 +180,29 @@ def main():
 
         # 处理系统命令
         if user_input.startswith("/"):
-            cmd = user_input.split()[0].lower()
-            if cmd in ["/history", "/state", "/snapshots", "/regen", "/edit", "/delete", "/export"]:
+            cmd = user_input.partition(" ")[0].lower()
+            if cmd in _SYSTEM_CMDS:
                 handle_system_command(runtime, conv_id, user_input, last_state)
                 continue
 
         try:
-            config = get_config()
-
-            if config.llm.stream:
+            if stream_mode:
                 # 流式输出模式
                 print("\nAI: ", end="", flush=True)
 
-                def stream_print(chunk: str):
-                    print(chunk, end="", flush=True)
-
-                result = runtime.run(conv_id, user_input, stream_callback=stream_print)
+                stream_print = StreamPrinter()
+                try:
+                    result = runtime.run(conv_id, user_input, stream_callback=stream_print)
+                finally:
+                    stream_print.flush()
+                    _history_cache.pop(conv_id, None)
                 print("\n")  # 流式结束后换行
             else:
                 # 普通模式
-                result = runtime.run(conv_id, user_input)
+                try:
+                    result = runtime.run(conv_id, user_input)
+                finally:
+                    _history_cache.pop(conv_id, None)
                 output = result.get("last_output", "")
                 if output:
                     print(f"\nAI: {output}\n")
@@ -145,132 +229,167 @@ def main():
 
 def handle_system_command(runtime, conv_id: str, command: str, last_state: dict = None):
     """处理系统命令"""
-    parts = command.split(maxsplit=1)
-    cmd = parts[0].lower()
+    cmd, _, arg = command.partition(" ")
+    handler = _SYSTEM_COMMANDS.get(cmd.lower())
+    if handler is None:
+        print(f"未知命令: {cmd}\n")
+        return
 
     try:
-        if cmd == "/state":
-            print("\n===== 当前 State =====")
-            state = runtime.get_state(conv_id)
-            if not state:
-                print("(暂无 state，先发送一条消息)")
-            else:
-                # 完整格式化输出
-                print(json.dumps(state, ensure_ascii=False, indent=2, default=str))
-            print("======================\n")
-
-        elif cmd == "/history":
-            messages = runtime.get_history(conv_id)
-            print("\n对话历史：")
-            if not messages:
-                print("  (暂无消息)")
-            else:
-                for i, msg in enumerate(messages):
-                    role_icon = "👤" if msg.get("role") == "user" else "🤖"
-                    content = msg.get("content", "").replace("\n", " ")
-                    content_preview = content[:60] + "..." if len(content) > 60 else content
-                    print(f"  [{i}] {role_icon} {content_preview}")
-            print()
-
-        elif cmd == "/edit":
-            arg = parts[1] if len(parts) > 1 else ""
-            if not arg:
-                print("用法: /edit <序号>  (序号从0开始，用 /history 查看)\n")
-                return
-
-            try:
-                idx = int(arg)
-            except ValueError:
-                print("序号必须是数字\n")
-                return
-
-            messages = runtime.get_history(conv_id)
-            if idx < 0 or idx >= len(messages):
-                print(f"序号超出范围 (0-{len(messages)-1})\n")
-                return
-
-            old_content = messages[idx].get("content", "")
-            print(f"\n当前内容: {old_content[:100]}{'...' if len(old_content) > 100 else ''}")
-            print("输入新内容 (直接回车取消):")
-            new_content = input("> ").strip()
-
-            if not new_content:
-                print("已取消\n")
-                return
-
-            success = runtime.edit_message(conv_id, idx, new_content)
-            if success:
-                print(f"✓ 消息 [{idx}] 已修改（未创建新 checkpoint）\n")
-            else:
-                print("✗ 修改失败\n")
-
-        elif cmd == "/delete":
-            arg = parts[1] if len(parts) > 1 else ""
-            if not arg:
-                print("用法: /delete <序号>  (序号从0开始，用 /history 查看)\n")
-                return
-
-            try:
-                idx = int(arg)
-            except ValueError:
-                print("序号必须是数字\n")
-                return
-
-            messages = runtime.get_history(conv_id)
-            if idx < 0 or idx >= len(messages):
-                print(f"序号超出范围 (0-{len(messages)-1})\n")
-                return
-
-            success = runtime.delete_message(conv_id, idx)
-            if success:
-                print(f"✓ 消息 [{idx}] 已删除（未创建新 checkpoint）\n")
-            else:
-                print("✗ 删除失败\n")
-
-        elif cmd == "/snapshots":
-            snapshots = runtime.get_state_history(conv_id, limit=5)
-            print("\n状态快照历史（最近5个）：")
-            if not snapshots:
-                print("  (暂无快照)")
-            else:
-                for s in snapshots:
-                    step = s.get("step", "?")
-                    checkpoint_id = s.get("checkpoint_id", "?")[:8]
-                    msg_count = len(s.get("values", {}).get("messages", []))
-                    print(f"  Step {step}: {checkpoint_id}... ({msg_count} 条消息)")
-            print()
-
-        elif cmd == "/export":
-            state = runtime.get_state(conv_id)
-            if not state:
-                print("暂无 state，先发送一条消息\n")
-                return
-            filename = f"state_{conv_id}.json"
-            path = Path.cwd() / filename
-            path.write_text(
-                json.dumps(state, ensure_ascii=False, indent=2, default=str),
-                encoding="utf-8",
-            )
-            print(f"已导出: {path}\n")
-
-        elif cmd == "/regen":
-            print("重新生成中...")
-            result = runtime.regenerate(conv_id)
-            output = result.get("last_output", "")
-            if output:
-                print(f"\nAI: {output}\n")
-            else:
-                print("重新生成失败\n")
-
-        else:
-            print(f"未知命令: {cmd}\n")
-
+        handler(runtime, conv_id, arg.strip())
     except Exception as e:
         print(f"错误: {e}\n")
         import traceback
         traceback.print_exc()
 
 
+def _cmd_state(runtime: Runtime, conv_id: str, arg: str):
+    """/state：查看完整状态"""
+    print("\n===== 当前 State =====")
+    state = runtime.get_state(conv_id)
+    if not state:
+        print("(暂无 state，先发送一条消息)")
+    else:
+        # 完整格式化输出
+        print(_dump_state(state).decode("utf-8"))
+    print("======================\n")
+
+
+_ROLE_ICONS = {"user": "👤"}
+
+
+def _cmd_history(runtime: Runtime, conv_id: str, arg: str):
+    """/history：查看对话历史（带序号）"""
+    messages = _history(runtime, conv_id)
+    print("\n对话历史：")
+    if not messages:
+        print("  (暂无消息)")
+    else:
+        for i, msg in enumerate(messages):
+            role_icon = _ROLE_ICONS.get(msg.get("role"), "🤖")
+            content = msg.get("content", "")
+            # 只处理需要显示的前 60 个字符
+            content_preview = content[:60].replace("\n", " ")
+            if len(content) > 60:
+                content_preview += "..."
+            print(f"  [{i}] {role_icon} {content_preview}")
+    print()
+
+
+def _cmd_edit(runtime: Runtime, conv_id: str, arg: str):
+    """/edit：编辑指定消息"""
+    if not arg:
+        print("用法: /edit <序号>  (序号从0开始，用 /history 查看)\n")
+        return
+
+    try:
+        idx = int(arg)
+    except ValueError:
+        print("序号必须是数字\n")
+        return
+
+    messages = _history(runtime, conv_id)
+    if idx < 0 or idx >= len(messages):
+        print(f"序号超出范围 (0-{len(messages)-1})\n")
+        return
+
+    old_content = messages[idx].get("content", "")
+    print(f"\n当前内容: {old_content[:100]}{'...' if len(old_content) > 100 else ''}")
+    print("输入新内容 (直接回车取消):")
+    new_content = _read_line("> ").strip()
+
+    if not new_content:
+        print("已取消\n")
+        return
+
+    success = runtime.edit_message(conv_id, idx, new_content)
+    _history_cache.pop(conv_id, None)
+    if success:
+        print(f"✓ 消息 [{idx}] 已修改（未创建新 checkpoint）\n")
+    else:
+        print("✗ 修改失败\n")
+
+
+def _cmd_delete(runtime: Runtime, conv_id: str, arg: str):
+    """/delete：删除指定消息"""
+    if not arg:
+        print("用法: /delete <序号>  (序号从0开始，用 /history 查看)\n")
+        return
+
+    try:
+        idx = int(arg)
+    except ValueError:
+        print("序号必须是数字\n")
+        return
+
+    messages = _history(runtime, conv_id)
+    if idx < 0 or idx >= len(messages):
+        print(f"序号超出范围 (0-{len(messages)-1})\n")
+        return
+
+    success = runtime.delete_message(conv_id, idx)
+    _history_cache.pop(conv_id, None)
+    if success:
+        print(f"✓ 消息 [{idx}] 已删除（未创建新 checkpoint）\n")
+    else:
+        print("✗ 删除失败\n")
+
+
+def _cmd_snapshots(runtime: Runtime, conv_id: str, arg: str):
+    """/snapshots：查看状态快照历史"""
+    snapshots = runtime.get_state_history(conv_id, limit=5)
+    print("\n状态快照历史（最近5个）：")
+    if not snapshots:
+        print("  (暂无快照)")
+    else:
+        for s in snapshots:
+            # 字段可能存在但值为 None，用 or 兜底（也避免每次分配空容器）
+            step = s.get("step")
+            messages = (s.get("values") or {}).get("messages") or ()
+            checkpoint_id = (s.get("checkpoint_id") or "?")[:8]
+            print(f"  Step {'?' if step is None else step}: {checkpoint_id}... ({len(messages)} 条消息)")
+    print()
+
+
+def _cmd_export(runtime: Runtime, conv_id: str, arg: str):
+    """/export：导出当前 state 到文件"""
+    state = runtime.get_state(conv_id)
+    if not state:
+        print("暂无 state，先发送一条消息\n")
+        return
+    filename = f"state_{conv_id}.json"
+    path = Path.cwd() / filename
+    path.write_bytes(_dump_state(state))
+    print(f"已导出: {path}\n")
+
+
+def _cmd_regen(runtime: Runtime, conv_id: str, arg: str):
+    """/regen：重新生成最后回复"""
+    print("重新生成中...")
+    try:
+        result = runtime.regenerate(conv_id)
+    finally:
+        _history_cache.pop(conv_id, None)
+    output = result.get("last_output", "")
+    if output:
+        print(f"\nAI: {output}\n")
+    else:
+        print("重新生成失败\n")
+
+
+# 系统命令 -> 处理函数
+_SYSTEM_COMMANDS = {
+    "/state": _cmd_state,
+    "/history": _cmd_history,
+    "/edit": _cmd_edit,
+    "/delete": _cmd_delete,
+    "/snapshots": _cmd_snapshots,
+    "/export": _cmd_export,
+    "/regen": _cmd_regen,
+}
+_SYSTEM_CMDS = frozenset(_SYSTEM_COMMANDS)
+
+
 def _select_conversation(runtime: Runtime) -> tuple[str | None, str | None]:
     conversations = runtime.list_conversations()
     if not conversations:
@@ -282,7 +401,7 @@ def _select_conversation(runtime: Runtime) -> tuple[str | None, str | None]:
         title = conv.get("title") or ""
         graph = conv.get("graph_name") or ""
         print(f"  [{i}] {conv.get('id')}  {graph}  {title}")
-    choice = input("选择序号(留空取消): ").strip()
+    choice = _read_line("选择序号(留空取消): ").strip()
     if choice == "":
         return None, None
     try:
@@ -1,14 +1,13 @@
 """
 数据库管理脚本：查看/删除 app.db 与 content.db 条目
 """
-import argparse
 import sys
 from pathlib import Path
 
-# 确保 backend 目录在 Python 路径中
-backend_dir = Path(__file__).resolve().parent.parent
-if str(backend_dir) not in sys.path:
-    sys.path.insert(0, str(backend_dir))
+# 以脚本方式运行（python cli/xxx.py）时才需要把 backend 目录加入 Python 路径；
+# 以模块方式运行（python -m cli.xxx）时 __package__ 非空，backend 已在路径中
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from core import Runtime
 
@@ -73,82 +72,106 @@ def delete_contents_by_tags(
     if not items:
         print("未找到匹配内容")
         return
-    deleted = 0
-    for item in items:
-        if runtime.contents.delete(content_type, item["id"], scope=scope):
-            deleted += 1
+    deleted = runtime.contents.delete_many(
+        content_type, [item["id"] for item in items], scope=scope
+    )
     print(f"已删除内容: {deleted} 条 (type={content_type}, scope={scope}, tags={','.join(tags)})")
 
 
+# ============================================================
+# 交互式菜单
+# ============================================================
+
+MENU_TEXT = (
+    "\n数据库管理菜单\n"
+    "  1. 列出会话(app.db)\n"
+    "  2. 删除会话(app.db)\n"
+    "  3. 删除全部会话(app.db)\n"
+    "  4. 列出内容(content.db)\n"
+    "  5. 删除内容(content.db)\n"
+    "  6. 按标签删除内容(content.db)\n"
+    "  0. 退出\n"
+)
+
+
+def _prompt_delete_conversation(runtime: Runtime):
+    conv_id = input("会话 ID: ").strip()
+    if conv_id:
+        delete_conversation(runtime, conv_id)
+
+
+def _prompt_delete_all_conversations(runtime: Runtime):
+    confirm = input("确认删除全部会话？输入 YES: ").strip()
+    delete_all_conversations(runtime, confirm == "YES")
+
+
+def _prompt_list_contents(runtime: Runtime):
+    content_type = input("内容类型(如 world_info/preset): ").strip()
+    scope = input("scope(默认 global): ").strip() or "global"
+    tags = input("tags(逗号分隔，可空): ").strip()
+    list_contents(
+        runtime,
+        content_type,
+        scope,
+        tags.split(",") if tags else None,
+    )
+
+
+def _prompt_delete_content(runtime: Runtime):
+    content_type = input("内容类型: ").strip()
+    content_id = input("内容 ID: ").strip()
+    scope = input("scope(默认 global): ").strip() or "global"
+    if content_type and content_id:
+        delete_content(runtime, content_type, content_id, scope)
+
+
+def _prompt_delete_contents_by_tags(runtime: Runtime):
+    content_type = input("内容类型: ").strip()
+    scope = input("scope(默认 global): ").strip() or "global"
+    tags_text = input("tags(逗号分隔): ").strip()
+    confirm = input("确认删除？输入 YES: ").strip()
+    if content_type and tags_text:
+        delete_contents_by_tags(
+            runtime,
+            content_type,
+            scope,
+            tags_text.split(","),
+            confirm == "YES",
+        )
+
+
+# 菜单选项 -> 处理函数
+MENU_HANDLERS = {
+    "1": list_conversations,
+    "2": _prompt_delete_conversation,
+    "3": _prompt_delete_all_conversations,
+    "4": _prompt_list_contents,
+    "5": _prompt_delete_content,
+    "6": _prompt_delete_contents_by_tags,
+}
+
+
 def main():
     # 无参数时进入交互式菜单
     if len(sys.argv) == 1:
         runtime = Runtime()
-        menu_text = (
-            "\n数据库管理菜单\n"
-            "  1. 列出会话(app.db)\n"
-            "  2. 删除会话(app.db)\n"
-            "  3. 删除全部会话(app.db)\n"
-            "  4. 列出内容(content.db)\n"
-            "  5. 删除内容(content.db)\n"
-            "  6. 按标签删除内容(content.db)\n"
-            "  0. 退出\n"
-        )
-        print(menu_text)
+        print(MENU_TEXT)
         while True:
             choice = input("选择操作(输入 m 查看菜单): ").strip()
             if choice.lower() == "m":
-                print(menu_text)
+                print(MENU_TEXT)
                 continue
             if choice == "0":
                 return
-            if choice == "1":
-                list_conversations(runtime)
-                continue
-            if choice == "2":
-                conv_id = input("会话 ID: ").strip()
-                if conv_id:
-                    delete_conversation(runtime, conv_id)
-                continue
-            if choice == "3":
-                confirm = input("确认删除全部会话？输入 YES: ").strip()
-                delete_all_conversations(runtime, confirm == "YES")
-                continue
-            if choice == "4":
-                content_type = input("内容类型(如 world_info/preset): ").strip()
-                scope = input("scope(默认 global): ").strip() or "global"
-                tags = input("tags(逗号分隔，可空): ").strip()
-                list_contents(
-                    runtime,
-                    content_type,
-                    scope,
-                    tags.split(",") if tags else None,
-                )
-                continue
-            if choice == "5":
-                content_type = input("内容类型: ").strip()
-                content_id = input("内容 ID: ").strip()
-                scope = input("scope(默认 global): ").strip() or "global"
-                if content_type and content_id:
-                    delete_content(runtime, content_type, content_id, scope)
-                continue
-            if choice == "6":
-                content_type = input("内容类型: ").strip()
-                scope = input("scope(默认 global): ").strip() or "global"
-                tags_text = input("tags(逗号分隔): ").strip()
-                confirm = input("确认删除？输入 YES: ").strip()
-                if content_type and tags_text:
-                    delete_contents_by_tags(
-                        runtime,
-                        content_type,
-                        scope,
-                        tags_text.split(","),
-                        confirm == "YES",
-                    )
-                continue
-            print("无效选择")
+            handler = MENU_HANDLERS.get(choice)
+            if handler:
+                handler(runtime)
+            else:
+                print("无效选择")
         return
 
+    import argparse  # 交互式菜单不需要，延迟导入
+
     parser = argparse.ArgumentParser(description="数据库管理工具")
     sub = parser.add_subparsers(dest="command", required=True)
 
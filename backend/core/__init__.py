@@ -1,6 +1,6 @@
 from .tools import ChatTools, LLMClient
 from .state import BaseState, ChatState, RoleplayState, CommandState
-from .runtime import Runtime
+from .runtime import Runtime, ConversationNotFoundError
 from .config import Config, load_config, get_config
 
 # 存储层
@@ -34,6 +34,7 @@ __all__ = [
     "CommandState",
     # 运行时
     "Runtime",
+    "ConversationNotFoundError",
     # 存储接口
     "ConversationStore",
     "ContentStore",
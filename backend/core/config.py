@@ -3,10 +3,16 @@
 """
 import os
 import yaml
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, is_dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Optional, get_type_hints
+
+try:
+    # libyaml C 扩展，比纯 Python 解析器快数倍
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 
 
 @dataclass
@@ -62,18 +68,70 @@ class Config:
     vector_store: VectorStoreConfig = field(default_factory=VectorStoreConfig)
 
 
+_config_file_path: Optional[Path] = None
+
+
 def _find_config_file() -> Path:
-    """查找配置文件"""
+    """查找配置文件（结果在进程内缓存，只向上查找一次）"""
+    global _config_file_path
+    if _config_file_path is not None:
+        return _config_file_path
+    
     # 从当前目录向上查找
     current = Path.cwd()
     for _ in range(5):
         config_path = current / "config.yaml"
         if config_path.exists():
+            _config_file_path = config_path
             return config_path
         current = current.parent
     
     # 默认路径
-    return Path("config.yaml")
+    _config_file_path = Path("config.yaml")
+    return _config_file_path
+
+
+@lru_cache(maxsize=None)
+def _field_spec(cls) -> tuple[tuple[str, type, bool], ...]:
+    """
+    解析 dataclass 的字段：(字段名, 类型, 是否为嵌套 dataclass)
+    
+    通过 get_type_hints 解析类型，字符串形式的注解同样适用；结果按类缓存
+    """
+    hints = get_type_hints(cls)
+    return tuple(
+        (f.name, hints[f.name], is_dataclass(hints[f.name]))
+        for f in fields(cls)
+    )
+
+
+@lru_cache(maxsize=None)
+def _builder(cls):
+    """
+    为 dataclass 生成专用的 dict -> 实例构造函数（按类缓存）
+    
+    生成的代码逐字段展开，运行时不再遍历 fields、判断嵌套类型；
+    值为 None 的字段不传入，保留 dataclass 自身的默认值
+    """
+    ns = {"cls": cls}
+    lines = [
+        "def build(data):",
+        "    if data is None:",
+        "        return cls()",
+        "    kwargs = {}",
+    ]
+    for i, (name, field_type, nested) in enumerate(_field_spec(cls)):
+        lines.append(f"    value = data.get({name!r})")
+        lines.append("    if value is not None:")
+        if nested:
+            # 嵌套 dataclass：调用其专用构造函数
+            ns[f"_build_{i}"] = _builder(field_type)
+            lines.append(f"        kwargs[{name!r}] = _build_{i}(value)")
+        else:
+            lines.append(f"        kwargs[{name!r}] = value")
+    lines.append("    return cls(**kwargs)")
+    exec("\n".join(lines), ns)
+    return ns["build"]
 
 
 def _dict_to_dataclass(cls, data: dict):
@@ -82,21 +140,7 @@ def _dict_to_dataclass(cls, data: dict):
     
     自动处理嵌套的 dataclass 字段
     """
-    from dataclasses import fields, is_dataclass
-    
-    if data is None:
-        return cls()
-    
-    kwargs = {}
-    for f in fields(cls):
-        value = data.get(f.name)
-        # 处理嵌套 dataclass
-        if value is not None and is_dataclass(f.type):
-            value = _dict_to_dataclass(f.type, value)
-        if value is not None:
-            kwargs[f.name] = value
-    
-    return cls(**kwargs)
+    return _builder(cls)(data)
 
 
 @lru_cache()
@@ -117,14 +161,14 @@ def load_config(path: str = None) -> Config:
         _resolve_relative_paths(cfg, Path.cwd())
         return cfg
     
-    with open(config_path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
+    with open(config_path, "rb") as f:
+        data = yaml.load(f, Loader=_YamlLoader) or {}
     
     # 加载 secrets.yaml 中的敏感配置
     secrets_path = config_path.parent / "secrets.yaml"
     if secrets_path.exists():
-        with open(secrets_path, "r", encoding="utf-8") as f:
-            secrets = yaml.safe_load(f) or {}
+        with open(secrets_path, "rb") as f:
+            secrets = yaml.load(f, Loader=_YamlLoader) or {}
         # 合并到 llm 配置
         if "llm" not in data:
             data["llm"] = {}
@@ -152,6 +196,12 @@ def _to_abs(path_value: str, base_dir: Path) -> Path:
     return path if path.is_absolute() else (base_dir / path)
 
 
+_config: Optional[Config] = None
+
+
 def get_config() -> Config:
-    """获取配置（便捷方法）"""
-    return load_config()
+    """获取配置（便捷方法，首次加载后直接返回模块级缓存）"""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
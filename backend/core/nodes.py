@@ -131,6 +131,10 @@ def parse_commands(pattern: str = r'/(\w+)\s+([^|/]+)'):
         #     "chat_content": "你好啊"
         # }
     """
+    # 正则在构建节点时编译一次
+    command_re = re.compile(pattern)
+    strip_re = re.compile(pattern + r'\|?')
+    
     def node(state: dict) -> dict:
         raw_input = state.get("raw_input", "")
         if not raw_input:
@@ -138,9 +142,9 @@ def parse_commands(pattern: str = r'/(\w+)\s+([^|/]+)'):
             if messages:
                 raw_input = messages[-1].get("content", "")
         
-        commands = re.findall(pattern, raw_input)
+        commands = command_re.findall(raw_input)
         command_list = [{"cmd": c[0], "arg": c[1].strip()} for c in commands]
-        chat_content = re.sub(pattern + r'\|?', '', raw_input).strip()
+        chat_content = strip_re.sub('', raw_input).strip()
         
         return {
             "commands": command_list,
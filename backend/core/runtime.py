@@ -3,24 +3,41 @@
 
 使用 LangGraph Checkpointer 管理状态，从 ContentStore 加载资产。
 """
+import asyncio
+import contextvars
 import importlib
 import json
 import sqlite3
+import threading
+import time
 import uuid
 from pathlib import Path
-from typing import Optional, Generator, Callable
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Optional, Generator, Callable
 
 import msgpack
 from langgraph.checkpoint.sqlite import SqliteSaver
 
 from .config import get_config
-from .tools import set_stream_callback
+from .tools import set_stream_callback, reset_stream_callback
 from .storage import (
     ConversationStore, ContentStore,
     SQLiteConversationStore, SQLiteContentStore,
 )
 
 
+class ConversationNotFoundError(ValueError):
+    """会话不存在"""
+    
+    def __init__(self, conversation_id: str):
+        super().__init__(f"会话不存在: {conversation_id}")
+        self.conversation_id = conversation_id
+
+
+class _StreamCancelled(Exception):
+    """流式消费端已退出，用于中止工作线程中的生成"""
+
+
 class Runtime:
     """
     运行时管理器
@@ -62,6 +79,12 @@ class Runtime:
             Path(db_path).parent.mkdir(parents=True, exist_ok=True)
             self._checkpoint_conn = sqlite3.connect(db_path, check_same_thread=False)
             self.checkpointer = SqliteSaver(self._checkpoint_conn)
+        
+        # 会话列表缓存：(写入时间, 列表)，会话增删或更新后失效
+        self._conv_list_cache: Optional[tuple[float, list[dict]]] = None
+    
+    # 会话列表缓存有效期（秒）
+    CONV_LIST_TTL = 5.0
     
     # ============================================================
     # 会话管理
@@ -97,6 +120,7 @@ class Runtime:
             content_refs=content_refs,
             config=config
         )
+        self._invalidate_conv_list()
         
         return conv_id
     
@@ -104,9 +128,38 @@ class Runtime:
         """获取会话信息"""
         return self.conversations.get(conversation_id)
     
-    def list_conversations(self) -> list[dict]:
-        """列出所有会话"""
-        return self.conversations.list_all()
+    def _require_conversation(self, conversation_id: str) -> dict:
+        """获取会话信息，不存在时抛出 ConversationNotFoundError"""
+        conv = self.conversations.get(conversation_id)
+        if not conv:
+            raise ConversationNotFoundError(conversation_id)
+        return conv
+    
+    def list_conversations(self, limit: Optional[int] = None) -> list[dict]:
+        """
+        列出会话（按更新时间降序，CONV_LIST_TTL 秒内复用上次的全量结果）
+        
+        Args:
+            limit: 只返回最近更新的 limit 个；未命中缓存时经 list_recent 查询，不取全量
+        """
+        cached = self._conv_list_cache
+        if cached and time.monotonic() - cached[0] < self.CONV_LIST_TTL:
+            return list(cached[1][:limit])
+        if limit is not None:
+            return self.conversations.list_recent(limit)
+        
+        items = self.conversations.list_all()
+        self._conv_list_cache = (time.monotonic(), items)
+        return list(items)
+    
+    def _invalidate_conv_list(self):
+        """会话增删或更新时间变化后，清除会话列表缓存"""
+        self._conv_list_cache = None
+    
+    def _touch(self, conversation_id: str):
+        """更新会话的最后活动时间"""
+        self.conversations.touch(conversation_id)
+        self._invalidate_conv_list()
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """
@@ -131,6 +184,7 @@ class Runtime:
         
         # 删除会话记录
         self.conversations.delete(conversation_id)
+        self._invalidate_conv_list()
         return True
     
     def clear_all_conversations(self) -> int:
@@ -140,7 +194,7 @@ class Runtime:
         Returns:
             删除的会话数量
         """
-        conversations = self.list_conversations()
+        conversations = self.conversations.list_all()
         count = 0
         for conv in conversations:
             if self.delete_conversation(conv["id"]):
@@ -242,9 +296,7 @@ class Runtime:
         Returns:
             最终状态字典
         """
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            raise ValueError(f"会话不存在: {conversation_id}")
+        conv = self._require_conversation(conversation_id)
         
         graph = self.load_graph(conv["graph_name"])
         thread_id = conv["thread_id"]
@@ -269,24 +321,21 @@ class Runtime:
             input_state["user_input"] = user_input
             input_state["raw_input"] = user_input
         
-        # 设置流式回调
-        if stream_callback:
-            set_stream_callback(stream_callback)
+        # 设置流式回调（只作用于当前上下文，不影响并发进行的其他生成）
+        token = set_stream_callback(stream_callback) if stream_callback else None
         
         try:
             result = graph.invoke(input_state, config=config)
         finally:
-            if stream_callback:
-                set_stream_callback(None)
+            if token is not None:
+                reset_stream_callback(token)
         
-        self.conversations.touch(conversation_id)
+        self._touch(conversation_id)
         return result
     
     def stream(self, conversation_id: str, user_input: str) -> Generator:
         """流式执行对话"""
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            raise ValueError(f"会话不存在: {conversation_id}")
+        conv = self._require_conversation(conversation_id)
         
         graph = self.load_graph(conv["graph_name"])
         thread_id = conv["thread_id"]
@@ -314,18 +363,146 @@ class Runtime:
         for state in graph.stream(input_state, config=config):
             yield state
         
-        self.conversations.touch(conversation_id)
+        self._touch(conversation_id)
+    
+    # ============================================================
+    # 异步流式执行
+    # ============================================================
+    
+    async def arun(self, conversation_id: str, user_input: str,
+                   flush_interval: float = 0.0,
+                   executor: Optional[Executor] = None) -> AsyncIterator[tuple[str, Any]]:
+        """
+        异步执行一轮对话，LLM 输出的片段到达即产出
+        
+        Args:
+            conversation_id: 会话 ID
+            user_input: 用户输入
+            flush_interval: 片段合并窗口（秒），0 表示只合并已到达的片段
+            executor: 执行同步生成的线程池，None 使用事件循环的默认线程池
+        
+        Yields:
+            ("chunk", str): 内容片段
+            ("done", dict): 最终状态（最后一项）
+        """
+        async for event in self._astream_call(
+            self.run, conversation_id, user_input,
+            flush_interval=flush_interval, executor=executor,
+        ):
+            yield event
+    
+    async def aregenerate(self, conversation_id: str,
+                          flush_interval: float = 0.0,
+                          executor: Optional[Executor] = None) -> AsyncIterator[tuple[str, Any]]:
+        """异步重新生成最后一条 AI 回复，参数与产出格式同 arun"""
+        async for event in self._astream_call(
+            self.regenerate, conversation_id,
+            flush_interval=flush_interval, executor=executor,
+        ):
+            yield event
+    
+    async def _astream_call(self, func: Callable, *args,
+                            flush_interval: float = 0.0,
+                            max_batch: int = 64,
+                            max_pending: int = 256,
+                            executor: Optional[Executor] = None) -> AsyncIterator[tuple[str, Any]]:
+        """
+        在线程池中执行同步的 func(*args, stream_callback=...)，
+        通过 asyncio.Queue 把工作线程中的片段实时转交给事件循环
+        
+        连续到达的片段会被合并为一个 ("chunk", str) 事件（最多 max_batch 个，
+        最多等待 flush_interval 秒），减少下游的帧数和写操作。
+        
+        队列最多缓存 max_pending 个片段，消费端跟不上时工作线程会阻塞等待（背压）；
+        消费端提前退出（如客户端断开）时，工作线程在下一个片段处中止生成。
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        cancelled = threading.Event()
+        
+        def put(event: tuple[str, Any]):
+            asyncio.run_coroutine_threadsafe(queue.put(event), loop).result()
+        
+        def stream_callback(chunk: str):
+            if cancelled.is_set():
+                raise _StreamCancelled()
+            put(("chunk", chunk))
+        
+        def worker():
+            try:
+                result = func(*args, stream_callback=stream_callback)
+            except Exception as e:
+                if not cancelled.is_set():
+                    put(("error", e))
+            else:
+                if not cancelled.is_set():
+                    put(("done", result))
+        
+        async def next_within(deadline: float):
+            """取下一个事件：优先取已到达的，否则最多等到 deadline"""
+            try:
+                return queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                return None
+            try:
+                return await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        
+        # 每个生成在独立的上下文副本中运行，其中设置的流式回调不会泄漏到线程池的其他任务
+        future = loop.run_in_executor(executor, contextvars.copy_context().run, worker)
+        finished = False
+        try:
+            event = await queue.get()
+            while True:
+                kind, payload = event
+                if kind == "error":
+                    finished = True
+                    raise payload
+                if kind == "done":
+                    finished = True
+                    yield kind, payload
+                    break
+                
+                # 合并后续片段
+                buffer = [payload]
+                deadline = loop.time() + flush_interval
+                event = None
+                while len(buffer) < max_batch:
+                    event = await next_within(deadline)
+                    if event is None or event[0] != "chunk":
+                        break
+                    buffer.append(event[1])
+                    event = None
+                yield "chunk", "".join(buffer)
+                if event is None:
+                    event = await queue.get()
+        finally:
+            if not finished:
+                # 消费端提前退出：通知工作线程中止，并清空队列以唤醒阻塞中的 put
+                cancelled.set()
+                while not queue.empty():
+                    queue.get_nowait()
+        await future
     
     # ============================================================
     # 历史与状态管理
     # ============================================================
     
     def get_history(self, conversation_id: str) -> list[dict]:
-        """获取对话历史（从 raw_messages 读取）"""
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            return []
+        """
+        获取对话历史（从 raw_messages 读取）
         
+        Raises:
+            ConversationNotFoundError: 会话不存在
+        """
+        return self._read_history(self._require_conversation(conversation_id))
+    
+    def _read_history(self, conv: dict) -> list[dict]:
+        """读取会话当前的 raw_messages"""
         graph = self.load_graph(conv["graph_name"])
         config = {"configurable": {"thread_id": conv["thread_id"]}}
         
@@ -335,10 +512,13 @@ class Runtime:
         return []
     
     def get_state(self, conversation_id: str) -> Optional[dict]:
-        """获取完整的会话状态"""
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            return None
+        """
+        获取完整的会话状态
+        
+        Raises:
+            ConversationNotFoundError: 会话不存在
+        """
+        conv = self._require_conversation(conversation_id)
         
         graph = self.load_graph(conv["graph_name"])
         config = {"configurable": {"thread_id": conv["thread_id"]}}
@@ -347,10 +527,13 @@ class Runtime:
         return state.values if state else None
     
     def get_state_history(self, conversation_id: str, limit: int = 10) -> list:
-        """获取状态历史（用于时间旅行）"""
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            return []
+        """
+        获取状态历史（用于时间旅行）
+        
+        Raises:
+            ConversationNotFoundError: 会话不存在
+        """
+        conv = self._require_conversation(conversation_id)
         
         graph = self.load_graph(conv["graph_name"])
         config = {"configurable": {"thread_id": conv["thread_id"]}}
@@ -358,7 +541,7 @@ class Runtime:
         history = []
         for state in graph.get_state_history(config):
             history.append({
-                "checkpoint_id": state.config.get("configurable", {}).get("checkpoint_id"),
+                "checkpoint_id": (state.config.get("configurable") or {}).get("checkpoint_id"),
                 "step": state.metadata.get("step"),
                 "values": state.values,
             })
@@ -369,9 +552,7 @@ class Runtime:
     
     def rollback_to(self, conversation_id: str, checkpoint_id: str) -> dict:
         """回滚到指定的历史状态"""
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            raise ValueError(f"会话不存在: {conversation_id}")
+        conv = self._require_conversation(conversation_id)
         
         graph = self.load_graph(conv["graph_name"])
         config = {
@@ -399,9 +580,7 @@ class Runtime:
         Returns:
             重新生成后的状态
         """
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            raise ValueError(f"会话不存在: {conversation_id}")
+        conv = self._require_conversation(conversation_id)
         
         graph = self.load_graph(conv["graph_name"])
         thread_id = conv["thread_id"]
@@ -431,17 +610,16 @@ class Runtime:
         input_state["user_input"] = raw_messages[-1].get("content", "")
         input_state["raw_input"] = raw_messages[-1].get("content", "")
         
-        # 设置流式回调
-        if stream_callback:
-            set_stream_callback(stream_callback)
+        # 设置流式回调（只作用于当前上下文，不影响并发进行的其他生成）
+        token = set_stream_callback(stream_callback) if stream_callback else None
         
         try:
             result = graph.invoke(input_state, config=config)
         finally:
-            if stream_callback:
-                set_stream_callback(None)
+            if token is not None:
+                reset_stream_callback(token)
         
-        self.conversations.touch(conversation_id)
+        self._touch(conversation_id)
         return result
     
     # ============================================================
@@ -457,7 +635,10 @@ class Runtime:
             updates: 要更新的字段，如 {"mood": "开心"} 或整个 raw_messages 列表
         
         Returns:
-            是否修改成功
+            是否修改成功（没有可修改的 checkpoint 时返回 False）
+        
+        Raises:
+            ConversationNotFoundError: 会话不存在
         
         Example:
             # 修改情绪
@@ -468,12 +649,11 @@ class Runtime:
             raw_messages[2]["content"] = "修改后的内容"
             runtime.edit_state(conv_id, {"raw_messages": raw_messages})
         """
-        conv = self.get_conversation(conversation_id)
-        if not conv:
-            return False
-        
-        thread_id = conv["thread_id"]
-        
+        conv = self._require_conversation(conversation_id)
+        return self._write_state(conv["thread_id"], updates)
+    
+    def _write_state(self, thread_id: str, updates: dict) -> bool:
+        """修改指定 thread 最新 checkpoint 的 channel_values"""
         # 读取最新 checkpoint
         cursor = self._checkpoint_conn.execute("""
             SELECT checkpoint_id, checkpoint 
@@ -521,14 +701,18 @@ class Runtime:
             new_content: 新的消息内容
         
         Returns:
-            是否修改成功
+            是否修改成功（索引无效时返回 False）
+        
+        Raises:
+            ConversationNotFoundError: 会话不存在
         """
-        raw_messages = self.get_history(conversation_id)
+        conv = self._require_conversation(conversation_id)
+        raw_messages = self._read_history(conv)
         if not raw_messages or message_index < 0 or message_index >= len(raw_messages):
             return False
         
         raw_messages[message_index]["content"] = new_content
-        return self.edit_state(conversation_id, {"raw_messages": raw_messages})
+        return self._write_state(conv["thread_id"], {"raw_messages": raw_messages})
     
     def delete_message(self, conversation_id: str, message_index: int) -> bool:
         """
@@ -539,14 +723,18 @@ class Runtime:
             message_index: 消息索引（0-based）
         
         Returns:
-            是否删除成功
+            是否删除成功（索引无效时返回 False）
+        
+        Raises:
+            ConversationNotFoundError: 会话不存在
         """
-        raw_messages = self.get_history(conversation_id)
+        conv = self._require_conversation(conversation_id)
+        raw_messages = self._read_history(conv)
         if not raw_messages or message_index < 0 or message_index >= len(raw_messages):
             return False
         
         del raw_messages[message_index]
-        return self.edit_state(conversation_id, {"raw_messages": raw_messages})
+        return self._write_state(conv["thread_id"], {"raw_messages": raw_messages})
     
     def delete_messages_after(self, conversation_id: str, message_index: int) -> bool:
         """
@@ -557,11 +745,15 @@ class Runtime:
             message_index: 消息索引（0-based），该消息会被保留
         
         Returns:
-            是否删除成功
+            是否删除成功（索引无效时返回 False）
+        
+        Raises:
+            ConversationNotFoundError: 会话不存在
         """
-        raw_messages = self.get_history(conversation_id)
+        conv = self._require_conversation(conversation_id)
+        raw_messages = self._read_history(conv)
         if not raw_messages or message_index < 0 or message_index >= len(raw_messages):
             return False
         
         raw_messages = raw_messages[:message_index + 1]
-        return self.edit_state(conversation_id, {"raw_messages": raw_messages})
\ No newline at end of file
+        return self._write_state(conv["thread_id"], {"raw_messages": raw_messages})
\ No newline at end of file
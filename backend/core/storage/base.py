@@ -8,7 +8,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Hashable, Iterable, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -17,7 +17,7 @@ from datetime import datetime
 # 数据模型
 # ============================================================
 
-@dataclass
+@dataclass(slots=True)
 class Conversation:
     """会话数据模型"""
     id: str = ""
@@ -30,7 +30,7 @@ class Conversation:
     updated_at: datetime = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Content:
     """
     通用内容数据模型
@@ -64,6 +64,8 @@ class ConversationStore(ABC):
     会话存储抽象接口
     
     职责：管理会话元信息
+    
+    get/list_all 返回 dict；其中的嵌套值可能与存储内部共享，不要原地修改
     """
     
     @abstractmethod
@@ -80,7 +82,7 @@ class ConversationStore(ABC):
     
     @abstractmethod
     def update(self, conversation_id: str, **fields):
-        """更新会话字段"""
+        """更新会话字段，fields 中未指定 updated_at 时同时刷新更新时间"""
         pass
     
     @abstractmethod
@@ -93,12 +95,23 @@ class ConversationStore(ABC):
         """列出所有会话"""
         pass
     
+    def list_recent(self, limit: int = 50) -> list[dict]:
+        """列出最近更新的 limit 个会话（按更新时间降序），子类可覆盖以避免取全量"""
+        return self.list_all()[:limit]
+    
     @abstractmethod
     def touch(self, conversation_id: str):
         """更新会话的最后访问时间"""
         pass
 
 
+def normalize_tags(tags: Optional[Iterable[str]]) -> Optional[tuple[str, ...]]:
+    """把标签筛选条件规范为去重、排序后的元组（可哈希，可作缓存键），空则返回 None"""
+    if not tags:
+        return None
+    return tuple(sorted(set(tags)))
+
+
 # ============================================================
 # 内容存储接口
 # ============================================================
@@ -114,6 +127,8 @@ class ContentStore(ABC):
     - 删除策略：硬删除（保持简单）
     - 冲突策略：Upsert（save 一个方法搞定）
     - Schema 验证：不验证（保持灵活，让 graph 层决定）
+    - 返回值：get/list/search 返回 dict，其中的 data 等嵌套值可能与存储内部共享，
+      需要修改 data 时请先复制
     
     使用示例::
     
@@ -147,6 +162,28 @@ class ContentStore(ABC):
         """
         pass
     
+    def save_many(self, type: str, items: Iterable[tuple[str, dict]],
+                  scope: str = "global", tags: list[str] = None) -> int:
+        """
+        批量保存内容（Upsert），所有条目使用相同的 scope 和 tags
+        
+        默认逐条调用 save；子类可覆盖为单次事务写入。
+        
+        Args:
+            type: 内容类型
+            items: (id, data) 序列，同一 ID 出现多次时以最后一条为准
+            scope: 作用域
+            tags: 可选标签列表
+            
+        Returns:
+            写入的条数
+        """
+        count = 0
+        for id, data in items:
+            self.save(type, id, data, scope=scope, tags=tags)
+            count += 1
+        return count
+    
     @abstractmethod
     def get(self, type: str, id: str, scope: str = "global") -> Optional[dict]:
         """
@@ -164,14 +201,15 @@ class ContentStore(ABC):
     
     @abstractmethod
     def list(self, type: str, scope: str = "global",
-             tags: list[str] = None) -> list[dict]:
+             tags: Optional[Iterable[str]] = None) -> list[dict]:
         """
         列出指定类型的所有内容
         
         Args:
             type: 内容类型
             scope: 作用域，默认 "global"
-            tags: 可选，按标签筛选（包含任一标签即匹配）
+            tags: 可选，按标签筛选（包含任一标签即匹配）；
+                  任意可迭代对象均可，与顺序无关
             
         Returns:
             内容列表
@@ -193,6 +231,21 @@ class ContentStore(ABC):
         """
         pass
     
+    @abstractmethod
+    def delete_many(self, type: str, ids: list[str], scope: str = "global") -> int:
+        """
+        批量删除内容（硬删除）
+        
+        Args:
+            type: 内容类型
+            ids: 内容 ID 列表
+            scope: 作用域
+            
+        Returns:
+            实际删除的数量
+        """
+        pass
+    
     @abstractmethod
     def exists(self, type: str, id: str, scope: str = "global") -> bool:
         """
@@ -223,3 +276,16 @@ class ContentStore(ABC):
             匹配的内容列表
         """
         pass
+    
+    def version(self) -> Optional[Hashable]:
+        """
+        数据版本标识
+        
+        任何写入提交后（包括其他连接、其他进程的写入）都会变化，
+        供上层缓存判断结果是否仍然有效（只保证同一线程内读取的版本可比较）。
+        默认返回 None，表示无法跟踪变化，调用方不应缓存。
+        
+        Returns:
+            可比较的版本值，或 None
+        """
+        return None
@@ -7,23 +7,63 @@
 """
 from __future__ import annotations
 
-from typing import Optional
+import json
+import sys
+import time
+from itertools import islice
+from typing import Iterable, Optional
 from datetime import datetime
 
-from .base import ConversationStore, ContentStore
+from sortedcontainers import SortedKeyList
+
+from .base import ConversationStore, ContentStore, normalize_tags
+
+
+# 时间戳以 time.time_ns() 整数保存（写入快、比较快），
+# updated_at 的 ISO 字符串在读取时才格式化（写入时置为 None 表示待生成）
+
+def _iso(ns: int) -> str:
+    """纳秒时间戳 -> 本地时间 ISO 字符串（与 datetime.now().isoformat() 格式一致）"""
+    return datetime.fromtimestamp(ns // 1_000_000_000).replace(
+        microsecond=ns // 1000 % 1_000_000
+    ).isoformat()
+
+
+def _fresh(item: dict) -> dict:
+    """
+    补齐待生成的 updated_at 字符串，返回内部字典的浅拷贝（去掉内部排序用的 updated_at_ns，
+    字段与 SQLite 存储一致）
+    
+    调用方改写返回的字典不影响存储内部；
+    data 等嵌套值仍是原对象，需要修改时请自行复制
+    """
+    if item["updated_at"] is None:
+        item["updated_at"] = _iso(item["updated_at_ns"])
+    result = dict(item)
+    del result["updated_at_ns"]
+    return result
 
 
 class InMemoryConversationStore(ConversationStore):
-    """内存会话存储"""
+    """
+    内存会话存储
+    
+    除 id -> 会话 的字典外，另维护一个按 updated_at_ns 排序的索引（存放同一批字典的引用），
+    list_all 无需每次排序；修改 updated_at_ns 前须先移出索引，改完再放回。
+    get/list_all 返回内部字典的浅拷贝。
+    """
     
     def __init__(self):
         self._conversations: dict[str, dict] = {}
+        self._order = SortedKeyList(key=lambda x: x["updated_at_ns"])
     
     def create(self, id: str, graph_name: str, thread_id: str,
                title: str = None, content_refs: dict = None,
                config: dict = None):
-        now = datetime.now().isoformat()
-        self._conversations[id] = {
+        self.delete(id)
+        now_ns = time.time_ns()
+        now = _iso(now_ns)
+        conv = {
             "id": id,
             "graph_name": graph_name,
             "thread_id": thread_id,
@@ -31,30 +71,45 @@ class InMemoryConversationStore(ConversationStore):
             "content_refs": content_refs,
             "config": config,
             "created_at": now,
-            "updated_at": now
+            "updated_at": now,
+            "updated_at_ns": now_ns,
         }
+        self._conversations[id] = conv
+        self._order.add(conv)
     
     def get(self, conversation_id: str) -> Optional[dict]:
-        return self._conversations.get(conversation_id)
+        conv = self._conversations.get(conversation_id)
+        return _fresh(conv) if conv is not None else None
     
     def update(self, conversation_id: str, **fields):
-        if conversation_id in self._conversations:
-            self._conversations[conversation_id].update(fields)
+        conv = self._conversations.get(conversation_id)
+        if conv is None:
+            return
+        if "updated_at" in fields and "updated_at_ns" not in fields:
+            # 显式指定了 updated_at 字符串：只改显示值，排序位置不变
+            conv.update(fields)
+            return
+        if "updated_at_ns" not in fields:
+            fields["updated_at_ns"] = time.time_ns()
+        fields.setdefault("updated_at", None)
+        self._order.remove(conv)
+        conv.update(fields)
+        self._order.add(conv)
     
     def delete(self, conversation_id: str):
-        self._conversations.pop(conversation_id, None)
+        conv = self._conversations.pop(conversation_id, None)
+        if conv is not None:
+            self._order.remove(conv)
     
     def list_all(self) -> list[dict]:
-        return sorted(
-            self._conversations.values(),
-            key=lambda x: x.get("updated_at", ""),
-            reverse=True
-        )
+        return [_fresh(conv) for conv in reversed(self._order)]
+    
+    def list_recent(self, limit: int = 50) -> list[dict]:
+        # 索引已有序，只需取末尾 limit 个
+        return [_fresh(conv) for conv in islice(reversed(self._order), limit)]
     
     def touch(self, conversation_id: str):
-        if conversation_id in self._conversations:
-            self._conversations[conversation_id]["updated_at"] = \
-                datetime.now().isoformat()
+        self.update(conversation_id)
 
 
 class InMemoryContentStore(ContentStore):
@@ -62,90 +117,189 @@ class InMemoryContentStore(ContentStore):
     内存内容存储
     
     适用场景：测试、临时会话、不需要持久化的场景
+    
+    get/list/search 返回内部字典的浅拷贝（嵌套的 data 与存储共享，不要原地修改）
     """
     
     def __init__(self):
-        # 使用 (type, id, scope) 作为 key
-        self._contents: dict[tuple[str, str, str], dict] = {}
+        # 使用 _make_key(type, id, scope) 生成的字符串作为 key（写入时驻留）
+        self._contents: dict[str, dict] = {}
+        # 二级索引，save/delete 时增量维护：
+        # (type, scope) -> {id: item}，list/search 只遍历对应分桶
+        self._by_type_scope: dict[tuple[str, str], dict[str, dict]] = {}
+        # (type, scope, tag) -> {id}，标签筛选转为集合并集
+        self._by_tag: dict[tuple[str, str, str], set[str]] = {}
+        # data 的 JSON 文本（save 时序列化一次，按 (type, scope) -> {id: 文本} 分桶）
+        # 与其 2-gram 倒排索引，供 search 使用
+        self._blobs: dict[tuple[str, str], dict[str, str]] = {}
+        self._ngram_index: dict[tuple[str, str, str], set[str]] = {}
+        # 写入次数，作为 version()
+        self._writes = 0
+    
+    @staticmethod
+    def _make_key(type: str, id: str, scope: str) -> str:
+        """
+        主键：以 \x1f 分隔的字符串
+        
+        写入时经 sys.intern 驻留；查找时直接构造即可（驻留本身也要一次查表）
+        """
+        return f"{type}\x1f{id}\x1f{scope}"
     
-    def _make_key(self, type: str, id: str, scope: str) -> tuple:
-        return (type, id, scope)
+    def _index_tags(self, type: str, id: str, scope: str, tags, add: bool):
+        for tag in tags or ():
+            tag_key = (type, scope, tag)
+            if add:
+                self._by_tag.setdefault(tag_key, set()).add(id)
+            else:
+                ids = self._by_tag.get(tag_key)
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del self._by_tag[tag_key]
+    
+    @staticmethod
+    def _ngrams(text: str) -> set[str]:
+        """
+        2-gram 集合（不区分中英文，逐字符滑动）
+        
+        按原文建立，不做大小写折叠：search 的精确匹配区分大小写，
+        而 lower() 并非逐字符映射（如希腊字母词尾 Σ -> ς），折叠后会漏掉本应匹配的内容
+        """
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+    
+    def _index_blob(self, type: str, id: str, scope: str, blob: Optional[str], add: bool):
+        if not blob:
+            return
+        for gram in self._ngrams(blob):
+            gram_key = (type, scope, gram)
+            if add:
+                self._ngram_index.setdefault(gram_key, set()).add(id)
+            else:
+                ids = self._ngram_index.get(gram_key)
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del self._ngram_index[gram_key]
     
     def save(self, type: str, id: str, data: dict,
              scope: str = "global", tags: list[str] = None) -> None:
         """保存内容（Upsert：存在则更新，不存在则创建）"""
-        key = self._make_key(type, id, scope)
-        now = datetime.now().isoformat()
+        key = sys.intern(self._make_key(type, id, scope))
+        now_ns = time.time_ns()
         
         existing = self._contents.get(key)
-        created_at = existing["created_at"] if existing else now
+        created_at = existing["created_at"] if existing else _iso(now_ns)
         
-        self._contents[key] = {
+        item = {
             "id": id,
             "type": type,
             "scope": scope,
             "data": data,
             "tags": tags,
             "created_at": created_at,
-            "updated_at": now,
+            "updated_at": None,
+            "updated_at_ns": now_ns,
         }
+        self._contents[key] = item
+        self._by_type_scope.setdefault((type, scope), {})[id] = item
+        
+        # 标签索引只更新差异部分
+        old_tags = set(existing.get("tags") or ()) if existing else set()
+        new_tags = set(tags or ())
+        self._index_tags(type, id, scope, old_tags - new_tags, add=False)
+        self._index_tags(type, id, scope, new_tags - old_tags, add=True)
+        
+        blob = json.dumps(data or {}, ensure_ascii=False)
+        blobs = self._blobs.setdefault((type, scope), {})
+        self._index_blob(type, id, scope, blobs.get(id), add=False)
+        self._index_blob(type, id, scope, blob, add=True)
+        blobs[id] = blob
+        self._writes += 1
     
     def get(self, type: str, id: str, scope: str = "global") -> Optional[dict]:
         """获取单个内容，不存在返回 None"""
-        key = self._make_key(type, id, scope)
-        return self._contents.get(key)
+        item = self._contents.get(f"{type}\x1f{id}\x1f{scope}")
+        return _fresh(item) if item is not None else None
     
     def list(self, type: str, scope: str = "global",
-             tags: list[str] = None) -> list[dict]:
+             tags: Optional[Iterable[str]] = None) -> list[dict]:
         """列出指定类型的所有内容，可按 tags 筛选"""
-        results = []
+        tags = normalize_tags(tags)
+        bucket = self._by_type_scope.get((type, scope))
+        if not bucket:
+            return []
         
-        for key, item in self._contents.items():
-            item_type, _, item_scope = key
-            if item_type != type or item_scope != scope:
-                continue
-            
-            # 按标签筛选（包含任一标签即匹配）
-            if tags:
-                item_tags = item.get("tags") or []
-                if not any(t in item_tags for t in tags):
-                    continue
-            
-            results.append(item)
+        if tags:
+            # 按标签筛选（包含任一标签即匹配）：各标签 ID 集合取并集
+            ids = set().union(*(self._by_tag.get((type, scope, t), ()) for t in tags))
+            results = [bucket[id] for id in ids]
+        else:
+            results = list(bucket.values())
         
         # 按更新时间降序排序
-        results.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-        return results
+        results.sort(key=lambda x: x["updated_at_ns"], reverse=True)
+        return [_fresh(item) for item in results]
+    
+    def _remove(self, type: str, id: str, scope: str) -> bool:
+        """从主表和索引中移除一条内容，返回是否存在"""
+        key = self._make_key(type, id, scope)
+        item = self._contents.pop(key, None)
+        if item is None:
+            return False
+        bucket = self._by_type_scope.get((type, scope))
+        if bucket is not None:
+            bucket.pop(id, None)
+            if not bucket:
+                del self._by_type_scope[(type, scope)]
+        self._index_tags(type, id, scope, set(item.get("tags") or ()), add=False)
+        blobs = self._blobs.get((type, scope))
+        if blobs is not None:
+            self._index_blob(type, id, scope, blobs.pop(id, None), add=False)
+            if not blobs:
+                del self._blobs[(type, scope)]
+        self._writes += 1
+        return True
     
     def delete(self, type: str, id: str, scope: str = "global") -> bool:
         """删除内容（硬删除），返回是否删除成功"""
-        key = self._make_key(type, id, scope)
-        if key in self._contents:
-            del self._contents[key]
-            return True
-        return False
+        return self._remove(type, id, scope)
+    
+    def delete_many(self, type: str, ids: list[str], scope: str = "global") -> int:
+        """批量删除内容，返回实际删除的数量"""
+        return sum(self._remove(type, id, scope) for id in ids)
     
     def exists(self, type: str, id: str, scope: str = "global") -> bool:
         """检查内容是否存在"""
-        key = self._make_key(type, id, scope)
-        return key in self._contents
+        return f"{type}\x1f{id}\x1f{scope}" in self._contents
+    
+    def version(self) -> int:
+        """数据版本：save/delete 的累计次数"""
+        return self._writes
     
     def search(self, type: str, keyword: str,
                scope: str = "global") -> list[dict]:
-        """在 data 中搜索关键词"""
-        import json
-        results = []
+        """
+        在 data 中搜索关键词
+        
+        先用 2-gram 倒排索引求出候选（关键词的每个 2-gram 都必须出现），
+        再对候选的缓存 JSON 文本做一次精确子串匹配
+        """
+        bucket = self._by_type_scope.get((type, scope))
+        if not bucket:
+            return []
+        
+        grams = self._ngrams(keyword)
+        if grams:
+            candidates = set.intersection(*(
+                self._ngram_index.get((type, scope, gram), set()) for gram in grams
+            ))
+        else:
+            # 关键词不足 2 个字符，无法走索引
+            candidates = bucket.keys()
         
-        for key, item in self._contents.items():
-            item_type, _, item_scope = key
-            if item_type != type or item_scope != scope:
-                continue
-            
-            # 在 data 的 JSON 字符串中搜索
-            data_str = json.dumps(item.get("data", {}), ensure_ascii=False)
-            if keyword in data_str:
-                results.append(item)
+        blobs = self._blobs[(type, scope)]
+        results = [bucket[id] for id in candidates if keyword in blobs[id]]
         
         # 按更新时间降序排序
-        results.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-        return results
+        results.sort(key=lambda x: x["updated_at_ns"], reverse=True)
+        return [_fresh(item) for item in results]
@@ -11,10 +11,10 @@ import json
 import sqlite3
 import threading
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 from contextlib import contextmanager
 
-from .base import ConversationStore, ContentStore
+from .base import ConversationStore, ContentStore, normalize_tags
 
 
 class SQLiteConnectionMixin:
@@ -108,8 +108,10 @@ class SQLiteConversationStore(SQLiteConnectionMixin, ConversationStore):
     
     def update(self, conversation_id: str, **fields):
         if not fields:
-            return
+            return self.touch(conversation_id)
         set_clause = ", ".join(f"{k} = ?" for k in fields.keys())
+        if "updated_at" not in fields:
+            set_clause += ", updated_at = CURRENT_TIMESTAMP"
         values = list(fields.values()) + [conversation_id]
         with self.transaction() as conn:
             conn.execute(f"""
@@ -131,6 +133,15 @@ class SQLiteConversationStore(SQLiteConnectionMixin, ConversationStore):
         """)
         return [dict(row) for row in cursor.fetchall()]
     
+    def list_recent(self, limit: int = 50) -> list[dict]:
+        cursor = self.conn.execute("""
+            SELECT id, graph_name, title, created_at, updated_at
+            FROM conversations
+            ORDER BY updated_at DESC
+            LIMIT ?
+        """, (limit,))
+        return [dict(row) for row in cursor.fetchall()]
+    
     def touch(self, conversation_id: str):
         with self.transaction() as conn:
             conn.execute("""
@@ -149,6 +160,8 @@ class SQLiteContentStore(SQLiteConnectionMixin, ContentStore):
     
     def __init__(self, db_path: str = "data/content.db"):
         self.db_path = db_path
+        # 本进程内的写入次数：本连接自己的写入不改变 data_version，由它补足 version()
+        self._writes = 0
         self._init_connection()
         self._ensure_table()
     
@@ -172,22 +185,38 @@ class SQLiteContentStore(SQLiteConnectionMixin, ContentStore):
                 ON contents(type, scope)
             """)
     
+    _UPSERT_SQL = """
+        INSERT INTO contents (type, id, scope, data, tags, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT(type, id, scope) DO UPDATE SET
+            data = excluded.data,
+            tags = excluded.tags,
+            updated_at = CURRENT_TIMESTAMP
+    """
+    
     def save(self, type: str, id: str, data: dict,
              scope: str = "global", tags: list[str] = None) -> None:
         """保存内容（Upsert：存在则更新，不存在则创建）"""
         with self.transaction() as conn:
-            conn.execute("""
-                INSERT INTO contents (type, id, scope, data, tags, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT(type, id, scope) DO UPDATE SET
-                    data = excluded.data,
-                    tags = excluded.tags,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (
+            conn.execute(self._UPSERT_SQL, (
                 type, id, scope,
                 json.dumps(data, ensure_ascii=False),
                 json.dumps(tags, ensure_ascii=False) if tags else None
             ))
+        self._after_write()
+    
+    def save_many(self, type: str, items: Iterable[tuple[str, dict]],
+                  scope: str = "global", tags: list[str] = None) -> int:
+        """批量保存内容（同一事务内 executemany，只提交一次），返回写入的条数"""
+        tags_json = json.dumps(tags, ensure_ascii=False) if tags else None
+        rows = [
+            (type, id, scope, json.dumps(data, ensure_ascii=False), tags_json)
+            for id, data in items
+        ]
+        with self.transaction() as conn:
+            conn.executemany(self._UPSERT_SQL, rows)
+        self._after_write()
+        return len(rows)
     
     def get(self, type: str, id: str, scope: str = "global") -> Optional[dict]:
         """获取单个内容，不存在返回 None"""
@@ -201,27 +230,82 @@ class SQLiteContentStore(SQLiteConnectionMixin, ContentStore):
             return None
         return self._row_to_dict(row)
     
+    # 每个线程最多缓存的 list 结果数，超出后整体清空
+    _LIST_CACHE_SIZE = 128
+    
+    def _list_cache(self) -> dict:
+        """
+        当前线程的 list 结果缓存：(type, scope, tags) -> 筛选后的行
+        
+        PRAGMA data_version 在其他连接提交写入后会变化，据此整体失效；
+        本连接自己的写入不改变 data_version，由 save/delete 显式清空。
+        """
+        local = self._local
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if getattr(local, "list_version", None) != version:
+            local.list_version = version
+            local.list_cache = {}
+        return local.list_cache
+    
+    def _clear_list_cache(self):
+        self._local.list_cache = {}
+    
+    def _after_write(self):
+        self._writes += 1
+        self._clear_list_cache()
+    
+    def version(self) -> tuple[int, int]:
+        """
+        数据版本：(当前线程连接的 PRAGMA data_version, 本进程写入次数)
+        
+        其他连接或进程提交写入后 data_version 变化，本进程的写入使写入次数变化。
+        data_version 只在同一连接内可比较，须在同一线程中读取和比较版本
+        """
+        return self.conn.execute("PRAGMA data_version").fetchone()[0], self._writes
+    
+    def close(self):
+        """关闭当前线程的连接（新连接的 data_version 不可比较，缓存一并清空）"""
+        super().close()
+        self._local.list_version = None
+        self._clear_list_cache()
+    
     def list(self, type: str, scope: str = "global",
-             tags: list[str] = None) -> list[dict]:
-        """列出指定类型的所有内容，可按 tags 筛选"""
+             tags: Optional[Iterable[str]] = None) -> list[dict]:
+        """
+        列出指定类型的所有内容，可按 tags 筛选
+        
+        查询和标签筛选的结果按 (type, scope, tags) 缓存在线程本地；
+        缓存的是原始行，每次调用重新解码，调用方可以放心修改返回的字典。
+        """
+        tags = normalize_tags(tags)
+        cache = self._list_cache()
+        key = (type, scope, tags)
+        rows = cache.get(key)
+        if rows is None:
+            rows = self._query_list(type, scope, tags)
+            if len(cache) >= self._LIST_CACHE_SIZE:
+                cache.clear()
+            cache[key] = rows
+        return [self._row_to_dict(row) for row in rows]
+    
+    def _query_list(self, type: str, scope: str,
+                    tags: Optional[tuple[str, ...]]) -> list:
         cursor = self.conn.execute("""
             SELECT id, type, scope, data, tags, created_at, updated_at
             FROM contents
             WHERE type = ? AND scope = ?
             ORDER BY updated_at DESC
         """, (type, scope))
+        rows = cursor.fetchall()
+        if not tags:
+            return rows
         
-        results = []
-        for row in cursor.fetchall():
-            item = self._row_to_dict(row)
-            # 按标签筛选（包含任一标签即匹配）
-            if tags:
-                item_tags = item.get("tags") or []
-                if not any(t in item_tags for t in tags):
-                    continue
-            results.append(item)
-        
-        return results
+        # 按标签筛选（包含任一标签即匹配）：查询标签先转为集合，每行一次 isdisjoint
+        query = frozenset(tags)
+        return [
+            row for row in rows
+            if row["tags"] and not query.isdisjoint(json.loads(row["tags"]))
+        ]
     
     def delete(self, type: str, id: str, scope: str = "global") -> bool:
         """删除内容（硬删除），返回是否删除成功"""
@@ -230,7 +314,27 @@ class SQLiteContentStore(SQLiteConnectionMixin, ContentStore):
                 DELETE FROM contents
                 WHERE type = ? AND id = ? AND scope = ?
             """, (type, id, scope))
-            return cursor.rowcount > 0
+        self._after_write()
+        return cursor.rowcount > 0
+    
+    # 单条 DELETE 语句最多绑定的 ID 数（低于 SQLite 旧版本 999 个参数的上限）
+    _DELETE_BATCH = 500
+    
+    def delete_many(self, type: str, ids: list[str], scope: str = "global") -> int:
+        """批量删除内容（同一事务内按 IN 列表删除），返回实际删除的数量"""
+        ids = list(ids)
+        deleted = 0
+        with self.transaction() as conn:
+            for start in range(0, len(ids), self._DELETE_BATCH):
+                batch = ids[start:start + self._DELETE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                cursor = conn.execute(f"""
+                    DELETE FROM contents
+                    WHERE type = ? AND scope = ? AND id IN ({placeholders})
+                """, (type, scope, *batch))
+                deleted += cursor.rowcount
+        self._after_write()
+        return deleted
     
     def exists(self, type: str, id: str, scope: str = "global") -> bool:
         """检查内容是否存在"""
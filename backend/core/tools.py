@@ -3,22 +3,112 @@
 
 记忆管理已移至 state，由 LangGraph checkpointer 自动持久化。
 """
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar, Token
 from typing import Optional, Callable
 
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-# 全局流式输出回调（由 Runtime 设置）
-_stream_callback: Optional[Callable[[str], None]] = None
+# OpenAI 格式 role -> LangChain 消息类（其余 role 按用户消息处理）
+_ROLE_MAP = {"system": SystemMessage, "assistant": AIMessage, "user": HumanMessage}
 
 
-def set_stream_callback(callback: Optional[Callable[[str], None]]):
-    """设置全局流式输出回调"""
-    global _stream_callback
-    _stream_callback = callback
+# Anthropic 单个请求允许的 cache_control 断点上限（tools、system、messages 合计）
+ANTHROPIC_MAX_CACHE_BREAKPOINTS = 4
+
+
+def _count_cache_breakpoints(messages: list, tools: Optional[list] = None) -> int:
+    """统计已绑定工具定义和消息内容块中已有的 cache_control 断点数"""
+    count = sum(1 for tool in tools or () if isinstance(tool, dict) and tool.get("cache_control"))
+    for msg in messages:
+        if isinstance(msg.content, list):
+            count += sum(
+                1 for block in msg.content
+                if isinstance(block, dict) and block.get("cache_control")
+            )
+    return count
+
+
+# 当前上下文的流式输出回调（由 Runtime 设置）
+# 用 ContextVar 而非模块全局变量：并发的多个生成各自在自己的上下文中设置，互不覆盖；
+# LangGraph 执行节点时会复制调用方的上下文，节点内的 LLMClient 能取到本次生成的回调
+_stream_callback: ContextVar[Optional[Callable[[str], None]]] = ContextVar(
+    "stream_callback", default=None
+)
+
+
+def set_stream_callback(callback: Optional[Callable[[str], None]]) -> Token:
+    """设置当前上下文的流式输出回调，返回用于 reset_stream_callback 的令牌"""
+    return _stream_callback.set(callback)
+
+
+def reset_stream_callback(token: Token):
+    """恢复 set_stream_callback 之前的回调"""
+    _stream_callback.reset(token)
 
 
 def get_stream_callback() -> Optional[Callable[[str], None]]:
-    """获取全局流式输出回调"""
-    return _stream_callback
+    """获取当前上下文的流式输出回调"""
+    return _stream_callback.get()
+
+
+# ============================================================
+# 响应缓存
+# ============================================================
+
+# 相同请求 -> 响应文本的 LRU 缓存。只缓存 temperature == 0 的非流式调用：
+# 输出可视为确定的，命中时直接返回，不再请求 LLM
+LLM_CACHE_SIZE = 1024
+_llm_cache: OrderedDict[bytes, str] = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+
+def _llm_cache_get(key: bytes) -> Optional[str]:
+    with _llm_cache_lock:
+        value = _llm_cache.get(key)
+        if value is not None:
+            _llm_cache.move_to_end(key)
+        return value
+
+
+def _llm_cache_set(key: bytes, value: str):
+    with _llm_cache_lock:
+        _llm_cache[key] = value
+        _llm_cache.move_to_end(key)
+        while len(_llm_cache) > LLM_CACHE_SIZE:
+            _llm_cache.popitem(last=False)
+
+
+def clear_llm_cache():
+    """清空 LLM 响应缓存"""
+    with _llm_cache_lock:
+        _llm_cache.clear()
+
+
+# provider -> LangChain ChatModel 类，首次使用时导入
+_PROVIDER_REGISTRY: dict[str, Callable] = {}
+
+# 不支持 base_url 的 provider
+_NO_BASE_URL_PROVIDERS = frozenset({"anthropic", "google"})
+
+
+def _get_provider(name: str) -> Callable:
+    """获取 provider 对应的 ChatModel 类（导入失败抛出 ImportError）"""
+    cls = _PROVIDER_REGISTRY.get(name)
+    if cls is not None:
+        return cls
+    if name == "anthropic":
+        from langchain_anthropic import ChatAnthropic as cls
+    elif name == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI as cls
+    else:
+        # 默认尝试 OpenAI 兼容接口
+        from langchain_openai import ChatOpenAI as cls
+    _PROVIDER_REGISTRY[name] = cls
+    return cls
 
 
 class LLMClient:
@@ -78,33 +168,16 @@ class LLMClient:
         """根据 provider 创建 LangChain ChatModel"""
         params = self._get_model_kwargs()
         
+        if self.provider in _NO_BASE_URL_PROVIDERS:
+            params.pop('base_url', None)
         try:
-            if self.provider == "openai":
-                from langchain_openai import ChatOpenAI
-                return ChatOpenAI(**params)
-            
-            elif self.provider == "anthropic":
-                from langchain_anthropic import ChatAnthropic
-                # Anthropic 不支持 base_url
-                params.pop('base_url', None)
-                return ChatAnthropic(**params)
-            
-            elif self.provider == "google":
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                # Google 参数略有不同
-                params.pop('base_url', None)
-                return ChatGoogleGenerativeAI(**params)
-            
-            else:
-                # 默认尝试 OpenAI 兼容接口
-                from langchain_openai import ChatOpenAI
-                return ChatOpenAI(**params)
-        
+            return _get_provider(self.provider)(**params)
         except ImportError as e:
             print(f"[警告] 无法导入 {self.provider} 的 LangChain 模块: {e}")
             return None
     
-    def invoke(self, prompt: str | list, stream_callback: Callable[[str], None] = None) -> str:
+    def invoke(self, prompt: str | list, stream_callback: Callable[[str], None] = None,
+               return_full: bool = True) -> str:
         """
         调用 LLM
         
@@ -112,72 +185,113 @@ class LLMClient:
             prompt: 提示词（字符串或消息列表）
             stream_callback: 流式输出回调，如果提供则使用流式模式
                             如果为 None 且配置了 stream=True，使用全局回调
+            return_full: 流式模式下是否拼接并返回完整文本；
+                         只需要回调输出时传 False，不保留中间结果
         
         Returns:
-            完整的响应文本
+            完整的响应文本（流式且 return_full=False 时为空字符串）
         """
         if self._client is None:
             return f"[模拟响应] 收到: {str(prompt)[:50]}..."
         
         # 转换为 LangChain 消息格式
-        if isinstance(prompt, str):
-            from langchain_core.messages import HumanMessage
-            messages = [HumanMessage(content=prompt)]
-        else:
-            messages = self._convert_messages(prompt)
+        messages = [HumanMessage(content=prompt)] if isinstance(prompt, str) else self._convert_messages(prompt)
         
         # 决定是否使用流式
         callback = stream_callback or (get_stream_callback() if self.stream else None)
         
         if callback:
             # 流式调用
-            return self._stream_invoke(messages, callback)
-        else:
-            # 普通调用
-            response = self._client.invoke(messages)
-            return response.content
+            return self._stream_invoke(messages, callback, return_full)
+        
+        # 普通调用（确定性输出时先查缓存）
+        key = self._cache_key(messages)
+        if key is not None:
+            cached = _llm_cache_get(key)
+            if cached is not None:
+                return cached
+        response = self._client.invoke(messages)
+        if key is not None and isinstance(response.content, str):
+            _llm_cache_set(key, response.content)
+        return response.content
     
-    def _stream_invoke(self, messages: list, callback: Callable[[str], None]) -> str:
+    def _cache_key(self, messages: list) -> Optional[bytes]:
+        """请求的缓存键（模型参数 + 消息的 BLAKE2b 摘要）；非确定性调用返回 None"""
+        if self.temperature != 0:
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        h.update(
+            f"{self.provider}\x1f{self.base_url}\x1f{self.model}\x1f"
+            f"{self.max_tokens}\x1f{self.top_p}\x1f".encode()
+        )
+        for msg in messages:
+            h.update(f"{msg.type}\x1f{msg.content!r}\x1e".encode())
+        return h.digest()
+    
+    def _stream_invoke(self, messages: list, callback: Callable[[str], None],
+                       return_full: bool = True) -> str:
         """流式调用 LLM 并通过回调输出"""
-        full_response = []
+        buf = io.StringIO() if return_full else None
         
         for chunk in self._client.stream(messages):
-            if chunk.content:
-                callback(chunk.content)
-                full_response.append(chunk.content)
+            content = chunk.content
+            if content:
+                callback(content)
+                if buf is not None:
+                    buf.write(content)
         
-        return "".join(full_response)
+        return buf.getvalue() if buf is not None else ""
     
     def _convert_messages(self, messages: list):
-        """将 OpenAI 格式消息转为 LangChain 格式"""
-        from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+        """
+        将 OpenAI 格式消息转为 LangChain 格式
         
-        result = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            
-            if role == "system":
-                result.append(SystemMessage(content=content))
-            elif role == "assistant":
-                result.append(AIMessage(content=content))
-            else:
-                result.append(HumanMessage(content=content))
-        
-        return result
+        Anthropic 需要显式标记才会缓存提示词前缀：开头连续的 system 消息（稳定前缀）中
+        最后一条带上 cache_control，缓存覆盖其之前的全部内容，同一前缀的后续请求按缓存价计费
+        （OpenAI 等会自动缓存，无需处理）。每个请求最多 ANTHROPIC_MAX_CACHE_BREAKPOINTS 个
+        断点，消息中已有的断点计入总数，达到上限时不再添加
+        """
+        converted = [
+            _ROLE_MAP.get(msg.get("role", "user"), HumanMessage)(content=msg.get("content", ""))
+            for msg in messages
+        ]
+        if self.provider != "anthropic":
+            return converted
+
+        prefix_end = 0
+        while prefix_end < len(converted) and isinstance(converted[prefix_end], SystemMessage):
+            prefix_end += 1
+        if prefix_end == 0:
+            return converted
+        last = converted[prefix_end - 1]
+        if not (isinstance(last.content, str) and last.content):
+            return converted
+        # 通过 bind_tools 绑定的客户端把工具定义放在 kwargs["tools"] 中
+        tools = getattr(self._client, "kwargs", {}).get("tools")
+        if _count_cache_breakpoints(converted, tools) >= ANTHROPIC_MAX_CACHE_BREAKPOINTS:
+            return converted
+        last.content = [{
+            "type": "text",
+            "text": last.content,
+            "cache_control": {"type": "ephemeral"},
+        }]
+        return converted
     
     async def ainvoke(self, prompt: str | list) -> str:
         """异步调用 LLM"""
         if self._client is None:
             return f"[模拟响应] 收到: {str(prompt)[:50]}..."
         
-        if isinstance(prompt, str):
-            from langchain_core.messages import HumanMessage
-            messages = [HumanMessage(content=prompt)]
-        else:
-            messages = self._convert_messages(prompt)
+        messages = [HumanMessage(content=prompt)] if isinstance(prompt, str) else self._convert_messages(prompt)
         
+        key = self._cache_key(messages)
+        if key is not None:
+            cached = _llm_cache_get(key)
+            if cached is not None:
+                return cached
         response = await self._client.ainvoke(messages)
+        if key is not None and isinstance(response.content, str):
+            _llm_cache_set(key, response.content)
         return response.content
 
 
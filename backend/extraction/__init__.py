@@ -15,11 +15,29 @@
     python -m extraction.run worldinfo novel.txt -o output.json
 """
 
-from .base import BaseExtractor, ExtractionResult
-from .worldinfo import WorldInfoExtractor
-
-__all__ = [
-    "BaseExtractor",
-    "ExtractionResult",
-    "WorldInfoExtractor",
-]
+from importlib import import_module
+
+# 公开名称 -> 所在子模块；首次访问时才导入（PEP 562）
+# base/worldinfo 会导入 core 与 LangChain，按需加载可让 `python -m extraction.run --help`
+# 和只读配置的场景不必承担这部分启动开销
+_EXPORTS = {
+    "BaseExtractor": ".base",
+    "ExtractionResult": ".base",
+    "LLMCache": ".cache",
+    "WorldInfoExtractor": ".worldinfo",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -3,25 +3,210 @@
 
 定义统一的抽取接口，子类实现具体的 prompt 和解析逻辑。
 """
+import asyncio
+import hashlib
 import json
+import os
+import random
 import re
+import sys
+import time
+from bisect import bisect_right
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any, Literal, Optional
 
 from core.tools import LLMClient
 
+from .cache import LLMCache
 
-@dataclass
+try:
+    # orjson 解析更快，且可直接接受 bytes；其 JSONDecodeError 是 json.JSONDecodeError 的子类
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    # 可选依赖：进度条
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+
+# extract_json 使用的正则，模块加载时编译一次
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
+# 括号扫描只关心的字符：括号、引号、反斜杠
+_JSON_TOKEN_RE = re.compile(r'[\[\]{}"\\]')
+# 混杂文本中最多尝试解析的候选片段数
+_MAX_JSON_CANDIDATES = 16
+
+
+def _find_json_span(text: str, pos: int = 0) -> Optional[tuple[int, int]]:
+    """
+    从 pos 起找到第一个括号配平的 [...] 或 {...}，返回 (start, end)
+    
+    单遍线性扫描，跳过字符串内部（含转义）的括号；只跳到关心的字符，不逐字符循环。
+    开括号直到文本末尾都没有配平（如说明文字里孤立的 "["）时，从其后的下一个开括号重新扫描，
+    最多尝试 _MAX_JSON_CANDIDATES 个开括号
+    """
+    for _ in range(_MAX_JSON_CANDIDATES):
+        span, start = _scan_json_span(text, pos)
+        if span is not None or start < 0:
+            return span
+        pos = start + 1
+    return None
+
+
+def _scan_json_span(text: str, pos: int) -> tuple[Optional[tuple[int, int]], int]:
+    """_find_json_span 的单次扫描，返回 (配平的区间或 None, 第一个开括号位置或 -1)"""
+    start = -1
+    depth = 0
+    in_string = False
+    escaped_until = -1
+    for m in _JSON_TOKEN_RE.finditer(text, pos):
+        i = m.start()
+        if i < escaped_until:
+            continue
+        ch = m.group()
+        if in_string:
+            if ch == "\\":
+                escaped_until = i + 2
+            elif ch == '"':
+                in_string = False
+        elif start < 0:
+            if ch in "[{":
+                start, depth = i, 1
+        elif ch == '"':
+            in_string = True
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+            if depth == 0:
+                return (start, i + 1), start
+    return None, start
+
+
+def _salvage_json_array(text: str) -> Optional[list]:
+    """
+    从第一个 [ 起，截取被截断的数组中已完整输出的对象/数组元素并解析
+    
+    数组本身是完整的（只是格式有误）或没有完整元素时返回 None
+    """
+    start = text.find("[")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped_until = -1
+    last_end = -1
+    for m in _JSON_TOKEN_RE.finditer(text, start):
+        i = m.start()
+        if i < escaped_until:
+            continue
+        ch = m.group()
+        if in_string:
+            if ch == "\\":
+                escaped_until = i + 2
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+            if depth == 1:
+                last_end = i + 1
+            elif depth == 0:
+                return None
+    if last_end < 0:
+        return None
+    try:
+        data = _json_loads(text[start:last_end] + "]")
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, list) else None
+
+
+# Markdown 标题行
+# 多行模式下一次匹配所有需要关注的行：group(1) 为围栏行（```），否则为标题行
+_HEADING_LINE_RE = re.compile(r"^(?:[^\S\n]*(```)|[^\S\n]{0,3}#{1,6}[^\S\n]+\S)", re.M)
+
+# 固定长度切分的候选边界：换行与句末标点（按优先级排列）
+_SENTENCE_SEPS = ("。", ".", "！", "!", "？", "?")
+_NEWLINE_RE = re.compile("\n")
+_SENTENCE_SEP_RES = {sep: re.compile(re.escape(sep)) for sep in _SENTENCE_SEPS}
+
+
+class _LineProgress:
+    """
+    未安装 tqdm 时的简易进度显示
+    
+    终端中用 \r 原地刷新同一行；输出被重定向时只在每完成约 10% 时写一行
+    """
+    
+    def __init__(self, total: int, desc: str):
+        self.total = total
+        self.desc = desc
+        self.done = 0
+        self._tty = sys.stdout.isatty()
+        self._step = max(1, total // 10)
+    
+    def update(self, n: int = 1):
+        self.done += n
+        if self._tty:
+            sys.stdout.write(f"\r  {self.desc} {self.done}/{self.total}")
+            sys.stdout.flush()
+        elif self.done % self._step == 0 or self.done == self.total:
+            print(f"  {self.desc} {self.done}/{self.total}")
+    
+    def close(self):
+        if self._tty and self.done:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+
+
+def _progress(total: int, desc: str):
+    """分块进度：有 tqdm 用 tqdm，否则退化为 _LineProgress"""
+    if tqdm is not None:
+        return tqdm(total=total, desc=desc)
+    return _LineProgress(total, desc)
+
+
+def _clip_source(text: str) -> str:
+    """ExtractionResult.source 使用的文本摘要：前 100 个字符"""
+    return text[:100] + "..." if len(text) > 100 else text
+
+
+def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+    """text[start:end].strip() 对应的区间（不复制子串）"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+@dataclass(slots=True)
 class ExtractionResult:
-    """抽取结果"""
+    """抽取结果（使用 __slots__，分块抽取会产生大量实例）"""
     success: bool
     data: Any = None                    # 抽取到的结构化数据
     raw_output: str = ""                # LLM 原始输出
     error: Optional[str] = None         # 错误信息
     source: Optional[str] = None        # 来源（文件路径或文本片段）
-    metadata: dict = field(default_factory=dict)  # 额外元数据
+    metadata: Optional[dict] = None     # 额外元数据（首次写入时才创建字典）
+    
+    def add_metadata(self, **items) -> None:
+        """写入元数据，metadata 为 None 时先创建"""
+        if self.metadata is None:
+            self.metadata = items
+        else:
+            self.metadata.update(items)
 
 
 class BaseExtractor(ABC):
@@ -35,6 +220,7 @@ class BaseExtractor(ABC):
     可选覆盖:
     - preprocess(): 预处理输入文本
     - postprocess(): 后处理抽取结果
+    - cache_salt(): 参与文件结果缓存键的配置（提示词等）
     """
     
     def __init__(
@@ -42,6 +228,9 @@ class BaseExtractor(ABC):
         model: str = None,
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        cache_dir: str | Path | None = None,
+        cache_max_entries: int = 256,
+        llm_cache: LLMCache | None = None,
         **llm_kwargs
     ):
         """
@@ -51,8 +240,15 @@ class BaseExtractor(ABC):
             model: LLM 模型名称，None 使用配置默认值
             temperature: 生成温度，抽取任务建议低一些
             max_tokens: 最大输出 token
+            cache_dir: extract_from_file 结果缓存目录，None 不缓存；
+                       文件内容和抽取配置都不变时直接返回上次的结果
+            cache_max_entries: 缓存文件数上限，超出时删除最久未使用的
+            llm_cache: LLM 响应缓存，None 不缓存；相同模型参数和提示词直接返回上次的输出
             **llm_kwargs: 其他 LLM 参数
         """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_max_entries = cache_max_entries
+        self.llm_cache = llm_cache
         self.llm = LLMClient(
             model=model,
             temperature=temperature,
@@ -65,17 +261,19 @@ class BaseExtractor(ABC):
     # 核心抽取方法
     # ============================================================
     
-    def extract(self, text: str, **kwargs) -> ExtractionResult:
+    def extract(self, text: str, *, refresh_cache: bool = False, **kwargs) -> ExtractionResult:
         """
         从文本中抽取数据
         
         Args:
             text: 输入文本
+            refresh_cache: 不读取 llm_cache，重新请求 LLM（失败重试时使用）
             **kwargs: 传递给 build_prompt 的额外参数
         
         Returns:
             ExtractionResult
         """
+        source = _clip_source(text)
         try:
             # 1. 预处理
             processed_text = self.preprocess(text)
@@ -83,11 +281,8 @@ class BaseExtractor(ABC):
             # 2. 构建 prompt
             prompt = self.build_prompt(processed_text, **kwargs)
             
-            # 3. 调用 LLM
-            raw_output = self.llm.invoke(prompt)
-            
-            # 4. 解析响应
-            data = self.parse_response(raw_output)
+            # 3. 调用 LLM 并解析响应
+            raw_output, data = self._invoke_and_parse(prompt, refresh_cache=refresh_cache)
             
             # 5. 后处理
             data = self.postprocess(data)
@@ -96,14 +291,14 @@ class BaseExtractor(ABC):
                 success=True,
                 data=data,
                 raw_output=raw_output,
-                source=text[:100] + "..." if len(text) > 100 else text,
+                source=source,
             )
         
         except Exception as e:
             return ExtractionResult(
                 success=False,
                 error=str(e),
-                source=text[:100] + "..." if len(text) > 100 else text,
+                source=source,
             )
     
     def extract_from_file(
@@ -117,7 +312,7 @@ class BaseExtractor(ABC):
         
         Args:
             file_path: 文件路径
-            encoding: 文件编码
+            encoding: 文件编码（无法解码的字节替换为 U+FFFD）
             **kwargs: 传递给 extract 的额外参数
         
         Returns:
@@ -133,7 +328,9 @@ class BaseExtractor(ABC):
             )
         
         try:
-            text = path.read_text(encoding=encoding)
+            raw = path.read_bytes()
+            # 个别损坏字节替换为 U+FFFD，不让整个文件因此失败（未知编码名仍按读取失败返回）
+            text = raw.decode(encoding, errors="replace")
         except Exception as e:
             return ExtractionResult(
                 success=False,
@@ -141,8 +338,17 @@ class BaseExtractor(ABC):
                 source=str(path),
             )
         
+        cache_path = self._cache_path(raw, kwargs)
+        if cache_path is not None:
+            cached = self._load_cached(cache_path)
+            if cached is not None:
+                cached.source = str(path)
+                return cached
+        
         result = self.extract(text, **kwargs)
         result.source = str(path)
+        if cache_path is not None and result.success:
+            self._store_cached(cache_path, result)
         return result
     
     def extract_chunks(
@@ -152,11 +358,14 @@ class BaseExtractor(ABC):
         overlap: int = 500,
         chunk_strategy: Literal["auto", "fixed", "chapters"] = "auto",
         chapter_max_chars: int = 20000,
+        concurrency: int = 4,
         **kwargs
     ) -> list[ExtractionResult]:
         """
         分块抽取（处理长文本）
         
+        各分块的 LLM 请求是网络 I/O，用线程池并发发送，最多 concurrency 个同时进行。
+        
         Args:
             text: 输入文本
             chunk_size: 每块大小（字符数）
@@ -166,29 +375,185 @@ class BaseExtractor(ABC):
                 - fixed: 固定长度 + overlap
                 - chapters: 按 Markdown 章节标题分块（超长章节再按 chapter_max_chars 切分）
             chapter_max_chars: 章节块最大字符数（仅在 chapters/auto 生效）
+            concurrency: 并发请求数，1 表示逐块串行
             **kwargs: 传递给 extract 的额外参数
         
         Returns:
-            每块的抽取结果列表
+            每块的抽取结果列表（与分块顺序一致）
         """
-        chunks = self._split_text(
+        # 只记录各块在原文中的区间，子串在工作线程处理该块时才切出，
+        # 同一时刻只有 concurrency 个分块副本
+        spans = self._split_spans(
             text,
             chunk_size,
             overlap,
             strategy=chunk_strategy,
             chapter_max_chars=chapter_max_chars,
         )
-        results = []
+        total = len(spans)
+        results: list[Optional[ExtractionResult]] = [None] * total
+        
+        def run(i: int, start: int, end: int) -> ExtractionResult:
+            return self.extract(text[start:end], chunk_index=i, total_chunks=total, **kwargs)
+        
+        if total <= 1:
+            # 短文本只有一块：直接在当前线程抽取，不创建线程池和进度条
+            return [self._tag_chunk(run(0, *spans[0]), 0, 1)] if spans else []
+        
+        progress = _progress(total, "抽取分块")
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                futures = {
+                    executor.submit(run, i, start, end): i
+                    for i, (start, end) in enumerate(spans)
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = self._tag_chunk(future.result(), i, total)
+                    progress.update(1)
+        finally:
+            progress.close()
+        
+        return results
+    
+    async def aextract_chunks(
+        self,
+        text: str,
+        chunk_size: int = 8000,
+        overlap: int = 500,
+        chunk_strategy: Literal["auto", "fixed", "chapters"] = "auto",
+        chapter_max_chars: int = 20000,
+        concurrency: int = 4,
+        **kwargs
+    ) -> list[ExtractionResult]:
+        """
+        分块抽取的异步版本，参数同 extract_chunks
+        
+        每块仍调用（可能被子类覆盖的）同步 extract，放到线程中执行，
+        由信号量限制同时进行的请求数。
+        """
+        spans = self._split_spans(
+            text,
+            chunk_size,
+            overlap,
+            strategy=chunk_strategy,
+            chapter_max_chars=chapter_max_chars,
+        )
+        total = len(spans)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def run(i: int, start: int, end: int) -> ExtractionResult:
+            async with semaphore:
+                result = await asyncio.to_thread(
+                    self.extract, text[start:end], chunk_index=i, total_chunks=total, **kwargs
+                )
+            return self._tag_chunk(result, i, total)
+        
+        return list(await asyncio.gather(*(run(i, *span) for i, span in enumerate(spans))))
+    
+    # Batch API 轮询状态的终态
+    _BATCH_DONE_STATES = frozenset({"completed", "failed", "expired", "cancelled"})
+    
+    def extract_batch(
+        self,
+        texts: list[str],
+        poll_interval: float = 30.0,
+        **kwargs
+    ) -> list[ExtractionResult]:
+        """
+        通过 OpenAI Batch API 批量抽取（异步批处理，费用约为同步调用的一半）
+        
+        所有请求写成一个 JSONL 一次提交，轮询直到批处理结束后逐条解析。
+        只执行一次主抽取调用；子类 extract 中的额外步骤（如 Gleaning）不会执行。
+        仅支持 OpenAI 兼容接口，且服务端需提供 /v1/batches。
+        
+        Args:
+            texts: 输入文本列表
+            poll_interval: 轮询间隔（秒）
+            **kwargs: 传递给 build_prompt 的额外参数
+        
+        Returns:
+            与 texts 一一对应的抽取结果
+        """
+        if self.llm.provider in ("anthropic", "google"):
+            raise ValueError(f"Batch API 暂不支持 provider: {self.llm.provider}")
+        if not texts:
+            return []
+        
+        from openai import OpenAI  # langchain-openai 的依赖
+        
+        client = OpenAI(api_key=self.llm.api_key, base_url=self.llm.base_url)
+        
+        lines = []
+        for i, text in enumerate(texts):
+            prompt = self.build_prompt(self.preprocess(text), **kwargs)
+            messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+            body = {"model": self.llm.model, "messages": messages}
+            if self.llm.temperature is not None:
+                body["temperature"] = self.llm.temperature
+            if self.llm.max_tokens is not None:
+                body["max_tokens"] = self.llm.max_tokens
+            lines.append(json.dumps({
+                "custom_id": f"chunk_{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }, ensure_ascii=False))
+        
+        batch_file = client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"  已提交批处理 {batch.id}（{len(texts)} 条请求）")
+        while batch.status not in self._BATCH_DONE_STATES:
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch.id)
         
-        for i, chunk in enumerate(chunks):
-            print(f"  处理分块 {i+1}/{len(chunks)}...")
-            result = self.extract(chunk, chunk_index=i, total_chunks=len(chunks), **kwargs)
-            result.metadata["chunk_index"] = i
-            result.metadata["total_chunks"] = len(chunks)
-            results.append(result)
+        # custom_id -> 模型输出文本 / 错误信息
+        outputs: dict[str, str] = {}
+        errors: dict[str, str] = {}
+        if batch.output_file_id:
+            for line in client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = _json_loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    outputs[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+                else:
+                    errors[record["custom_id"]] = str(record.get("error") or response.get("body"))
         
+        results = []
+        for i, text in enumerate(texts):
+            source = _clip_source(text)
+            custom_id = f"chunk_{i}"
+            raw_output = outputs.get(custom_id)
+            if raw_output is None:
+                error = errors.get(custom_id) or f"批处理未返回结果（状态: {batch.status}）"
+                results.append(ExtractionResult(success=False, error=error, source=source))
+                continue
+            try:
+                data = self.postprocess(self.parse_response(raw_output))
+                results.append(ExtractionResult(
+                    success=True, data=data, raw_output=raw_output, source=source,
+                ))
+            except Exception as e:
+                results.append(ExtractionResult(
+                    success=False, error=str(e), raw_output=raw_output, source=source,
+                ))
         return results
     
+    @staticmethod
+    def _tag_chunk(result: ExtractionResult, index: int, total: int) -> ExtractionResult:
+        """在结果元数据中记录分块序号"""
+        result.add_metadata(chunk_index=index, total_chunks=total)
+        return result
+    
     # ============================================================
     # 子类实现
     # ============================================================
@@ -198,6 +563,10 @@ class BaseExtractor(ABC):
         """
         构建发给 LLM 的提示词
         
+        建议返回 [system, user] 消息列表：指令放在 system 中且各分块逐字节相同，
+        分块文本和 chunk_index 等随块变化的内容只放在 user 中，
+        这样服务端的前缀缓存（prompt caching）才能在各分块之间命中。
+        
         Args:
             text: 预处理后的文本
             **kwargs: 额外参数
@@ -242,9 +611,107 @@ class BaseExtractor(ABC):
         """
         return data
     
+    def cache_salt(self) -> str:
+        """
+        影响抽取结果的配置，参与 extract_from_file 的缓存键
+        
+        默认：类名 + 模型参数
+        子类有自定义提示词等配置时应覆盖并追加
+        """
+        llm = self.llm
+        return f"{type(self).__qualname__}|{llm.model}|{llm.temperature}|{llm.max_tokens}"
+    
     # ============================================================
     # 工具方法
     # ============================================================
+
+    # 触发限流（HTTP 429）时的重试次数与首次退避秒数（之后每次翻倍，带随机抖动）
+    RATE_LIMIT_RETRIES = 4
+    RATE_LIMIT_BACKOFF = 1.0
+    
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        return (
+            getattr(error, "status_code", None) == 429
+            or type(error).__name__ == "RateLimitError"
+        )
+    
+    def _invoke_and_parse(self, prompt: str | list, *, refresh_cache: bool = False) -> tuple[str, Any]:
+        """
+        调用 LLM 并用 parse_response 解析，返回 (原始输出, 解析结果)
+        
+        设置了 llm_cache 时先查缓存；只有解析成功的输出才写回缓存，
+        否则重试和续跑会一直拿到同一份坏输出。缓存中无法解析的旧输出会被删除并重新请求。
+        refresh_cache=True 时跳过缓存读取（新的输出解析成功后仍会覆盖写入）。
+        """
+        cache = self.llm_cache
+        if cache is None:
+            raw_output = self._invoke_with_backoff(prompt)
+            return raw_output, self.parse_response(raw_output)
+        
+        llm = self.llm
+        params = f"{llm.temperature}|{llm.max_tokens}"
+        if not refresh_cache:
+            raw_output = cache.get(llm.model, params, prompt)
+            if raw_output is not None:
+                try:
+                    return raw_output, self.parse_response(raw_output)
+                except Exception:
+                    cache.delete(llm.model, params, prompt)
+        
+        raw_output = self._invoke_with_backoff(prompt)
+        data = self.parse_response(raw_output)
+        cache.set(llm.model, params, prompt, raw_output)
+        return raw_output, data
+    
+    def _invoke_with_backoff(self, prompt: str | list) -> str:
+        """调用 LLM；并发抽取时遇到限流按指数退避重试"""
+        delay = self.RATE_LIMIT_BACKOFF
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            try:
+                return self.llm.invoke(prompt)
+            except Exception as e:
+                if attempt == self.RATE_LIMIT_RETRIES or not self._is_rate_limited(e):
+                    raise
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+
+    def _cache_path(self, raw: bytes, kwargs: dict) -> Optional[Path]:
+        """文件结果的缓存路径：BLAKE2b(配置 + 额外参数 + 文件内容)"""
+        if self.cache_dir is None:
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.cache_salt()}|{sorted(kwargs.items())!r}|".encode())
+        h.update(raw)
+        return self.cache_dir / f"{h.hexdigest()}.json"
+    
+    def _load_cached(self, cache_path: Path) -> Optional[ExtractionResult]:
+        """读取缓存结果，不存在或损坏返回 None；命中时刷新 mtime 供 LRU 清理"""
+        try:
+            result = ExtractionResult(**_json_loads(cache_path.read_bytes()))
+            os.utime(cache_path)
+        except (OSError, ValueError, TypeError):
+            return None
+        return result
+    
+    def _store_cached(self, cache_path: Path, result: ExtractionResult) -> None:
+        """写入缓存（先写临时文件再替换），超出上限时按 mtime 删除最旧的条目"""
+        try:
+            payload = json.dumps(asdict(result), ensure_ascii=False)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            tmp_path.write_text(payload, encoding="utf-8")
+            tmp_path.replace(cache_path)
+            
+            entries = list(cache_path.parent.glob("*.json"))
+            if len(entries) > self.cache_max_entries:
+                entries.sort(key=lambda p: p.stat().st_mtime)
+                for old in entries[: len(entries) - self.cache_max_entries]:
+                    old.unlink(missing_ok=True)
+        except (OSError, TypeError, ValueError):
+            # 数据无法序列化或磁盘错误时放弃缓存，不影响抽取结果
+            pass
+    
     
     def _split_text(
         self,
@@ -284,69 +751,119 @@ class BaseExtractor(ABC):
         - chapters: 按 Markdown 标题行（# / ## / ...）切分章节；章节过长则按 chapter_max_chars 再切
         - auto: 有多个章节标题则使用 chapters，否则使用 fixed
         """
-        if not text or not text.strip():
+        spans = self._split_spans(
+            text,
+            chunk_size,
+            overlap,
+            strategy=strategy,
+            chapter_max_chars=chapter_max_chars,
+        )
+        return [text[start:end] for start, end in spans]
+
+    def _split_spans(
+        self,
+        text: str,
+        chunk_size: int,
+        overlap: int,
+        *,
+        strategy: Literal["auto", "fixed", "chapters"] = "auto",
+        chapter_max_chars: int = 20000,
+    ) -> list[tuple[int, int]]:
+        """
+        同 _split_text_ex，但返回各块在原文中的 (start, end) 区间（已去除首尾空白）
+
+        切分过程不复制子串；调用方可以等到真正处理某块时再切片。
+        区间本身不缓存；需要对同一文本反复切分的调用方（如 extraction.run）自行保存区间
+        """
+        start, end = _strip_span(text, 0, len(text))
+        if start == end:
             return []
 
         if strategy == "fixed":
-            return self._split_text_fixed(text, chunk_size, overlap)
+            return self._split_fixed_spans(text, chunk_size, overlap)
 
+        headings = None
         if strategy == "auto":
             headings = self._find_markdown_heading_positions(text)
             # 至少 2 个标题才有明显“章节化”价值，避免误判
-            strategy = "chapters" if len(headings) >= 2 else "fixed"
-            return self._split_text_ex(
-                text,
-                chunk_size,
-                overlap,
-                strategy=strategy,
-                chapter_max_chars=chapter_max_chars,
-            )
+            if len(headings) < 2:
+                return self._split_fixed_spans(text, chunk_size, overlap)
 
-        # chapters
-        chapters = self._split_markdown_chapters(text)
+        # chapters（auto 已找到的标题位置直接复用，不再扫描一遍）
+        chapters = self._chapter_spans(text, headings)
         if not chapters:
-            return self._split_text_fixed(text, chunk_size, overlap)
+            return self._split_fixed_spans(text, chunk_size, overlap)
 
         max_chars = int(chapter_max_chars) if chapter_max_chars else 0
         if max_chars <= 0:
-            return [c for c in chapters if c.strip()]
+            return chapters
 
-        out: list[str] = []
-        for ch in chapters:
-            ch = ch.strip()
-            if not ch:
-                continue
-            if len(ch) <= max_chars:
-                out.append(ch)
+        out: list[tuple[int, int]] = []
+        for start, end in chapters:
+            if end - start <= max_chars:
+                out.append((start, end))
                 continue
             # 超长章节：按章节上限再切，避免单章过长
-            out.extend(self._split_text_fixed(ch, max_chars, overlap))
+            out.extend(self._split_fixed_spans(text, max_chars, overlap, start, end))
         return out
 
     def _split_text_fixed(self, text: str, chunk_size: int, overlap: int) -> list[str]:
         """固定长度切分：优先段落/换行/句末边界，带 overlap。"""
-        if len(text) <= chunk_size:
-            return [text.strip()]
+        return [text[start:end] for start, end in self._split_fixed_spans(text, chunk_size, overlap)]
+
+    def _split_fixed_spans(
+        self,
+        text: str,
+        chunk_size: int,
+        overlap: int,
+        lo_bound: int = 0,
+        hi_bound: Optional[int] = None,
+    ) -> list[tuple[int, int]]:
+        """固定长度切分 text[lo_bound:hi_bound]，返回各块在 text 中的区间"""
+        if hi_bound is None:
+            hi_bound = len(text)
+        if hi_bound - lo_bound <= chunk_size:
+            return [_strip_span(text, lo_bound, hi_bound)]
+
+        # 先收集换行位置，之后每块只需二分查找；
+        # 句末标点（中文正文中数量最多）只在某个窗口内没有换行时才按需收集
+        newlines = [m.start() for m in _NEWLINE_RE.finditer(text, lo_bound, hi_bound)]
+        paragraphs = [p for p in newlines if p + 1 < hi_bound and text[p + 1] == "\n"]
+        sentence_positions: dict[str, list[int]] = {}
+
+        def sentence_ends(sep: str) -> list[int]:
+            positions = sentence_positions.get(sep)
+            if positions is None:
+                positions = [m.start() for m in _SENTENCE_SEP_RES[sep].finditer(text, lo_bound, hi_bound)]
+                sentence_positions[sep] = positions
+            return positions
 
-        chunks: list[str] = []
-        start = 0
+        def last_before(positions: list[int], lo: int, hi: int) -> int:
+            """positions 中 lo <= p < hi 的最大值，不存在返回 -1"""
+            i = bisect_right(positions, hi - 1) - 1
+            return positions[i] if i >= 0 and positions[i] >= lo else -1
 
-        while start < len(text):
+        spans: list[tuple[int, int]] = []
+        start = lo_bound
+
+        while start < hi_bound:
             end = start + chunk_size
 
-            if end >= len(text):
-                chunks.append(text[start:].strip())
+            if end >= hi_bound:
+                spans.append(_strip_span(text, start, hi_bound))
                 break
 
-            # 尝试在段落边界切分
-            split_pos = text.rfind("\n\n", start + chunk_size // 2, end)
+            # 窗口下界至少为 start + 1，保证切分点前进（chunk_size < 2 时也不会原地循环）
+            lo = start + max(1, chunk_size // 2)
+            # 尝试在段落边界切分（"\n\n" 须完整落在窗口内）
+            split_pos = last_before(paragraphs, lo, end - 1)
             if split_pos == -1:
                 # 没找到段落边界，尝试换行符
-                split_pos = text.rfind("\n", start + chunk_size // 2, end)
+                split_pos = last_before(newlines, lo, end)
             if split_pos == -1:
                 # 没找到换行符，尝试句号
-                for sep in ["。", ".", "！", "!", "？", "?"]:
-                    split_pos = text.rfind(sep, start + chunk_size // 2, end)
+                for sep in _SENTENCE_SEPS:
+                    split_pos = last_before(sentence_ends(sep), lo, end)
                     if split_pos != -1:
                         split_pos += 1  # 包含标点
                         break
@@ -354,87 +871,105 @@ class BaseExtractor(ABC):
                 # 都没找到，直接切
                 split_pos = end
 
-            chunks.append(text[start:split_pos].strip())
-            start = split_pos - overlap  # 带重叠
-            if start < 0:
-                start = split_pos
+            spans.append(_strip_span(text, start, split_pos))
+            # 带重叠；overlap 过大时至少前进到本块末尾，保证不会原地循环
+            next_start = split_pos - overlap
+            start = next_start if next_start > start else split_pos
 
-        return [c for c in chunks if c]
+        return [(a, b) for a, b in spans if a < b]
 
     def _find_markdown_heading_positions(self, text: str) -> list[int]:
         """
         找到 Markdown 标题行起始位置（忽略 ``` 围栏代码块内部）。
         例如：# ○椎名日和的独白
+        
+        用一个多行正则直接在原文上定位围栏行和标题行，不拆分行列表
         """
         positions: list[int] = []
         in_fence = False
-        offset = 0
-        for line in text.splitlines(keepends=True):
-            stripped = line.lstrip()
-            if stripped.startswith("```"):
+        for m in _HEADING_LINE_RE.finditer(text):
+            if m.group(1):
                 in_fence = not in_fence
-            if not in_fence:
-                if re.match(r"^\s{0,3}#{1,6}\s+\S", line):
-                    positions.append(offset)
-            offset += len(line)
+            elif not in_fence:
+                positions.append(m.start())
         return positions
 
-    def _split_markdown_chapters(self, text: str) -> list[str]:
-        """按 Markdown 标题分章：每个 chunk 从标题行开始，包含到下一个标题之前。"""
-        positions = self._find_markdown_heading_positions(text)
+    def _split_markdown_chapters(self, text: str, positions: Optional[list[int]] = None) -> list[str]:
+        """
+        按 Markdown 标题分章：每个 chunk 从标题行开始，包含到下一个标题之前。
+        
+        positions 为已算好的标题位置（可省略）
+        """
+        return [text[start:end] for start, end in self._chapter_spans(text, positions)]
+
+    def _chapter_spans(self, text: str, positions: Optional[list[int]] = None) -> list[tuple[int, int]]:
+        """同 _split_markdown_chapters，返回各章在原文中的区间"""
+        if positions is None:
+            positions = self._find_markdown_heading_positions(text)
         if not positions:
             return []
 
-        segments: list[str] = []
+        spans: list[tuple[int, int]] = []
         # 处理首标题前的“前言/序章”内容
         if positions[0] > 0:
-            pre = text[: positions[0]].strip()
-            if pre:
-                segments.append(pre)
-
-        for i, start in enumerate(positions):
-            end = positions[i + 1] if i + 1 < len(positions) else len(text)
-            seg = text[start:end].strip()
-            if seg:
-                segments.append(seg)
+            spans.append(_strip_span(text, 0, positions[0]))
 
-        return segments
+        bounds = positions[1:] + [len(text)]
+        spans.extend(_strip_span(text, start, end) for start, end in zip(positions, bounds))
+        return [(a, b) for a, b in spans if a < b]
     
     @staticmethod
-    def extract_json(text: str) -> Any:
+    def extract_json(text: str | bytes) -> Any:
         """
-        从文本中提取 JSON
+        从文本中提取 JSON（bytes 会先按 UTF-8 解码）
         
         支持:
         - 纯 JSON
         - ```json ... ``` 代码块
         - 混杂文本中的 JSON
+        - 被截断的 JSON 数组（只保留完整的元素）
         """
-        import re
+        if isinstance(text, bytes):
+            # 纯 JSON 的 bytes 直接交给解析器，省去一次解码
+            stripped = text.strip()
+            if stripped[:1] in (b"[", b"{"):
+                try:
+                    return _json_loads(stripped)
+                except json.JSONDecodeError:
+                    pass
+            text = text.decode("utf-8")
         
         text = text.strip()
         
-        # 1. 尝试直接解析
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
+        # 1. 尝试直接解析（开头不像 JSON 时跳过，省去异常开销）
+        if text[:1] in ("[", "{", '"'):
+            try:
+                return _json_loads(text)
+            except json.JSONDecodeError:
+                pass
         
         # 2. 尝试提取 ```json ... ``` 代码块
-        match = re.search(r"```(?:json)?\s*([\s\S]*?)```", text)
+        match = _JSON_FENCE_RE.search(text)
         if match:
             try:
-                return json.loads(match.group(1).strip())
+                return _json_loads(match.group(1).strip())
             except json.JSONDecodeError:
                 pass
         
-        # 3. 尝试提取 [...] 或 {...}
-        for pattern in [r"\[[\s\S]*\]", r"\{[\s\S]*\}"]:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    return json.loads(match.group(0))
-                except json.JSONDecodeError:
-                    pass
+        # 3. 尝试提取第一个括号配平的 [...] 或 {...}，解析失败则从其后继续找
+        pos = 0
+        for _ in range(_MAX_JSON_CANDIDATES):
+            span = _find_json_span(text, pos)
+            if span is None:
+                break
+            try:
+                return _json_loads(text[span[0]:span[1]])
+            except json.JSONDecodeError:
+                pos = span[0] + 1
+        
+        # 4. 输出被截断（如达到 max_tokens）：保留数组中已完整输出的元素
+        salvaged = _salvage_json_array(text)
+        if salvaged is not None:
+            return salvaged
         
         raise ValueError(f"无法从文本中提取 JSON: {text[:200]}...")
@@ -0,0 +1,93 @@
+"""
+LLM 响应缓存
+
+以 (模型, 生成参数, 提示词) 的 SHA-256 为键，把 LLM 原始输出存入 SQLite。
+重跑抽取（断点续跑、调整后处理、重叠分块）时相同的请求直接返回上次的输出，
+不再产生 API 调用。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class LLMCache:
+    """
+    基于 SQLite 的 LLM 响应缓存（精确匹配）
+
+    每个线程使用独立连接，可供 extract_chunks 的线程池并发读写。
+    """
+
+    def __init__(self, db_path: str | Path = "data/llm_cache.db"):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    prompt TEXT,
+                    response TEXT NOT NULL
+                )
+            """)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _prompt_text(prompt: str | list) -> str:
+        """提示词统一为文本：消息列表序列化为 JSON"""
+        if isinstance(prompt, str):
+            return prompt
+        return json.dumps(prompt, ensure_ascii=False, sort_keys=True)
+
+    @staticmethod
+    def make_key(model: str, params: str, prompt_text: str) -> str:
+        """缓存键：sha256(模型|生成参数|提示词)"""
+        return hashlib.sha256(f"{model}|{params}|{prompt_text}".encode()).hexdigest()
+
+    def get(self, model: str, params: str, prompt: str | list) -> Optional[str]:
+        """查询缓存，未命中返回 None"""
+        key = self.make_key(model, params, self._prompt_text(prompt))
+        row = self.conn.execute("SELECT response FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, model: str, params: str, prompt: str | list, response: str) -> None:
+        """写入缓存（已存在则覆盖）"""
+        prompt_text = self._prompt_text(prompt)
+        key = self.make_key(model, params, prompt_text)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, model, prompt, response) VALUES (?, ?, ?, ?)",
+                (key, model, prompt_text, response),
+            )
+
+    def delete(self, model: str, params: str, prompt: str | list) -> None:
+        """删除一条缓存（不存在时忽略）"""
+        key = self.make_key(model, params, self._prompt_text(prompt))
+        with self.conn:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条数"""
+        with self.conn:
+            return self.conn.execute("DELETE FROM cache").rowcount
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -13,6 +13,12 @@ from typing import Any
 
 import yaml
 
+try:
+    # libyaml C 扩展，比纯 Python 解析器快数倍
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 @dataclass(frozen=True)
 class ExtractionConfig:
@@ -32,6 +38,11 @@ class ExtractionConfig:
     import_db: bool = False
     estimate_tokens: bool = False
     estimate_only: bool = False
+    batch: bool = False
+    workers: int = 4
+    max_concurrency: int = 4
+    cache_enabled: bool = False
+    cache_path: str | None = None
     model: str | None = None
     temperature: float | None = None
 
@@ -77,8 +88,8 @@ def get_extraction_config() -> ExtractionConfig:
         return ExtractionConfig()
 
     try:
-        with config_path.open("r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
+        with config_path.open("rb") as f:
+            data = yaml.load(f, Loader=_YamlLoader) or {}
     except Exception:
         return ExtractionConfig()
 
@@ -109,6 +120,11 @@ def get_extraction_config() -> ExtractionConfig:
         import_db=_coerce_bool(payload.get("import_db"), False),
         estimate_tokens=_coerce_bool(payload.get("estimate_tokens"), False),
         estimate_only=_coerce_bool(payload.get("estimate_only"), False),
+        batch=_coerce_bool(payload.get("batch"), False),
+        workers=_coerce_int(payload.get("workers"), 4),
+        max_concurrency=_coerce_int(payload.get("max_concurrency"), 4),
+        cache_enabled=_coerce_bool(payload.get("cache_enabled"), False),
+        cache_path=_coerce_str(payload.get("cache_path")),
         model=model,
         temperature=_coerce_float(payload.get("temperature"), None),
     )
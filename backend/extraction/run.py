@@ -15,20 +15,377 @@
     
     # 直接导入到 content.db
     python -m extraction.run worldinfo input.txt --import-db
+    
+    # 缓存 LLM 响应，重跑时相同请求不再调用 API
+    python -m extraction.run worldinfo novel.txt --cache
+    
+    # 目录模式，通过 Batch API 批量提交
+    python -m extraction.run worldinfo --input-dir novels/ --batch
 """
 import argparse
+import atexit
 import json
 import sys
 import math
 import hashlib
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    # orjson 解析更快，且可直接接受 bytes；其 JSONDecodeError 是 json.JSONDecodeError 的子类
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
 # 确保 backend 目录在 Python 路径中
 backend_dir = Path(__file__).parent.parent
 if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
 
+# token 估算中按 1 字 1 token 计的 CJK 字符（连续一段整体匹配）
+_CJK_RUN_RE = re.compile(
+    "["
+    "\u4e00-\u9fff"  # CJK Unified Ideographs
+    "\u3400-\u4dbf"  # CJK Extension A
+    "\U00020000-\U0002a6df"  # CJK Extension B
+    "\U0002a700-\U0002b73f"  # CJK Extension C
+    "\U0002b740-\U0002b81f"  # CJK Extension D
+    "\U0002b820-\U0002ceaf"  # CJK Extension E
+    "\uf900-\ufaff"  # CJK Compatibility Ideographs
+    "]+"
+)
+
+
+# 目录模式文件文本缓存的内存预算（字节）
+_TEXT_CACHE_BYTES = 512 << 20
+
+
+@lru_cache(maxsize=4096)
+def _normalize_source(source: str) -> str:
+    """增量文件中的 source 路径规范化（同一文件的记录成千上万条，结果缓存）"""
+    return str(Path(source))
+
+
+def _write_json(path: Path, data) -> None:
+    """写出缩进 JSON：有 orjson 时直接编码为 bytes，否则用 json.dump 流式写入文件"""
+    if orjson is None:
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return
+    path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+
+def _format_json(data) -> str:
+    """缩进 JSON 文本（打印到控制台用）"""
+    if orjson is None:
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    # 解码回 str 交给 print，按控制台自身编码输出（Windows 控制台不一定是 UTF-8）
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def _dumps_bytes(data) -> bytes:
+    """紧凑 JSON 编码为 UTF-8 bytes"""
+    if orjson is None:
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _dumps_line(payload: dict) -> bytes:
+    """单条 JSONL 记录编码为 UTF-8 bytes（含换行）"""
+    if orjson is None:
+        return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+
+
+class JsonlAppender:
+    """
+    增量 JSONL 文件的追加写入器
+
+    整个运行期间只打开一次文件（首次 append 时），记录写入大缓冲区，
+    每 FLUSH_EVERY 条刷到文件一次，close() 时无条件刷出。
+    进程被强杀时最多丢失最后不足 FLUSH_EVERY 条记录，续跑时这些 chunk 会重新抽取。
+    可被多个线程并发调用。
+    """
+
+    FLUSH_EVERY = 16
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fh = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def append(self, payload: dict) -> None:
+        """追加一条记录"""
+        line = _dumps_line(payload)
+        with self._lock:
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = self.path.open("ab", buffering=1 << 20)
+            self._fh.write(line)
+            self._pending += 1
+            if self._pending >= self.FLUSH_EVERY:
+                self._fh.flush()
+                self._pending = 0
+
+    def flush(self) -> None:
+        """把缓冲区中的记录写入文件（重新读取增量文件前调用）"""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                self._pending = 0
+
+    def close(self) -> None:
+        """刷出并关闭文件，可重复调用"""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+                self._pending = 0
+
+
+def _parse_chunk_record(line: bytes) -> tuple[str, int, dict] | None:
+    """解析增量文件的一行，返回 (source, chunk_index, {"hash", "entries", "success"})；无效行返回 None"""
+    try:
+        obj = _json_loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    source = _normalize_source(obj.get("source", ""))
+    chunk_index = obj.get("chunk_index")
+    chunk_hash = obj.get("chunk_hash")
+    if not (source and chunk_index is not None and chunk_hash):
+        return None
+    return source, chunk_index, {
+        "hash": chunk_hash,
+        "entries": obj.get("entries", []),
+        "success": bool(obj.get("success", True)),
+    }
+
+
+class ChunkIndex:
+    """
+    增量 JSONL 的 SQLite 索引（与增量文件同名，后缀 .sqlite）
+
+    只保存每个 (source, chunk_index) 最新记录的摘要（哈希、是否成功）和该行在增量文件中的
+    字节位置，以及已收录到的增量文件字节偏移；entries 本身不入索引，由 ChunkEntriesReader
+    在真正需要时按位置从增量文件读出。
+    续跑时读出全部摘要（不解析任何 entries），只解析偏移之后新追加的行并补进索引。
+    增量文件被截断或替换（偏移前最后一段内容对不上）时整体重建。
+
+    索引文件（及 WAL 模式下异常退出时残留的 -wal/-shm）随增量文件一起存在，
+    删除增量文件后下次运行会一并清理，也可以手动与增量文件一起删除。
+    """
+
+    # 校验增量文件未被替换时比对的字节数（偏移之前的最后一段）
+    TAIL_CHECK_BYTES = 4096
+
+    # 旧版本索引在 chunks 表中保存 entries，版本不符时重建
+    SCHEMA_VERSION = 2
+
+    def __init__(self, jsonl_path: Path):
+        self.jsonl_path = Path(jsonl_path)
+        self.db_path = _index_path(self.jsonl_path)
+        self.conn = sqlite3.connect(self.db_path, timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS chunks")
+                self.conn.execute("DROP TABLE IF EXISTS meta")
+                self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    source TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    success INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (source, chunk_index)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value
+                )
+            """)
+
+    def _meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _tail_digest(self, f, offset: int) -> str:
+        start = max(0, offset - self.TAIL_CHECK_BYTES)
+        f.seek(start)
+        return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+    def load(self) -> dict[str, dict]:
+        """
+        读取已处理 chunk 的摘要，并把增量文件的新增部分收录进索引
+
+        返回: {source: {chunk_index: {"hash", "success", "offset", "length"}}}
+        （不含 entries，用 ChunkEntriesReader 按 offset/length 读取）
+        """
+        processed: dict[str, dict] = {}
+        with self.jsonl_path.open("rb") as f:
+            size = f.seek(0, 2)
+            offset = self._meta("offset") or 0
+            if offset and (offset > size or self._meta("tail") != self._tail_digest(f, offset)):
+                offset = 0
+            if offset == 0:
+                with self.conn:
+                    self.conn.execute("DELETE FROM chunks")
+
+            for source, chunk_index, chunk_hash, success, line_offset, length in self.conn.execute(
+                "SELECT source, chunk_index, hash, success, offset, length FROM chunks"
+            ):
+                processed.setdefault(source, {})[chunk_index] = {
+                    "hash": chunk_hash,
+                    "success": bool(success),
+                    "offset": line_offset,
+                    "length": length,
+                }
+
+            # 解析偏移之后新追加的行；最后一行没有换行说明写入未完成，不收录也不推进偏移
+            rows = {}
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                line_offset = offset
+                offset += len(line)
+                record = _parse_chunk_record(line.strip()) if line.strip() else None
+                if record is None:
+                    continue
+                source, chunk_index, info = record
+                processed.setdefault(source, {})[chunk_index] = {
+                    "hash": info["hash"],
+                    "success": info["success"],
+                    "offset": line_offset,
+                    "length": len(line),
+                }
+                rows[(source, chunk_index)] = (
+                    source, chunk_index, info["hash"], int(info["success"]), line_offset, len(line),
+                )
+            tail = self._tail_digest(f, offset)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (source, chunk_index, hash, success, offset, length) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows.values(),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (("offset", offset), ("tail", tail)),
+            )
+        return processed
+
+    def close(self):
+        self.conn.close()
+
+
+def _index_path(jsonl_path: Path) -> Path:
+    """增量文件对应的 ChunkIndex 索引路径"""
+    return Path(jsonl_path).with_suffix(".sqlite")
+
+
+def _remove_index_files(jsonl_path: Path) -> None:
+    """删除增量文件的索引及其 -wal/-shm 文件（增量文件已不存在时调用）"""
+    db_path = _index_path(jsonl_path)
+    for path in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"   ⚠️ 无法删除残留的增量索引 {path}: {e}")
+
+
+class ChunkEntriesReader:
+    """
+    按需读取已处理 chunk 的 entries
+
+    ChunkIndex 加载的记录只有摘要和行位置，entries 在复用该 chunk 时才从增量文件中读出解析；
+    完整扫描得到的记录自带 entries，直接返回。可被多个线程并发调用。
+    """
+
+    def __init__(self, jsonl_path: Path):
+        self.path = Path(jsonl_path)
+        self._fh = None
+        self._lock = threading.Lock()
+
+    def entries(self, info: dict) -> list:
+        """返回记录对应的 entries"""
+        entries = info.get("entries")
+        if entries is not None:
+            return entries
+        with self._lock:
+            if self._fh is None:
+                self._fh = self.path.open("rb")
+            self._fh.seek(info["offset"])
+            line = self._fh.read(info["length"])
+        record = _parse_chunk_record(line.strip())
+        if record is None or record[2]["hash"] != info["hash"]:
+            raise ValueError(f"增量文件与索引不一致（偏移 {info['offset']}），请删除 {_index_path(self.path)} 后重试")
+        return record[2]["entries"]
+
+    def close(self) -> None:
+        """关闭文件，可重复调用"""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def _load_processed_chunks(jsonl_path: Path) -> dict[str, dict]:
+    """
+    加载已处理的 chunk 记录
+    返回: {source: {chunk_index: {"hash": chunk_hash, "success": bool, ...}}}
+
+    优先通过 ChunkIndex 索引加载（只解析新增的行，记录不含 entries，由 ChunkEntriesReader 读取）；
+    索引不可用时整份扫描增量文件（记录带 "entries"）
+    """
+    processed = {}
+    if not jsonl_path.exists():
+        # 增量文件已被删除：一并清理遗留的索引，避免与新的增量文件错配
+        _remove_index_files(jsonl_path)
+        return processed
+    try:
+        index = ChunkIndex(jsonl_path)
+        try:
+            return index.load()
+        finally:
+            index.close()
+    except sqlite3.Error as e:
+        print(f"   ⚠️ 增量索引不可用，改为完整扫描增量文件: {e}")
+    try:
+        # 二进制模式逐行读取，每行的 bytes 直接交给解析器，不逐行解码
+        with jsonl_path.open("rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = _parse_chunk_record(line)
+                if record is not None:
+                    source, chunk_index, info = record
+                    processed.setdefault(source, {})[chunk_index] = info
+    except Exception:
+        return processed
+    return processed
+
+
 def cmd_worldinfo(args):
     """世界书抽取命令"""
     from extraction import WorldInfoExtractor
@@ -61,54 +418,26 @@ def cmd_worldinfo(args):
     llm_merge_enabled = bool(args.llm_merge)
     if args.prompts_dir:
         extractor_kwargs["prompts_dir"] = args.prompts_dir
+    if args.cache:
+        from extraction.cache import LLMCache
+        extractor_kwargs["llm_cache"] = LLMCache(args.cache_path or "data/llm_cache.db")
     extractor = WorldInfoExtractor(
         enable_llm_merge=llm_merge_enabled,
         **extractor_kwargs
     )
 
-    def _append_jsonl(path: Path, payload: dict) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
-
-    def _load_processed_chunks(jsonl_path: Path) -> dict[str, dict]:
-        """
-        加载已处理的 chunk 记录
-        返回: {source: {chunk_index: {"hash": chunk_hash, "entries": [...]}}}
-        """
-        processed = {}
-        if not jsonl_path.exists():
-            return processed
-        try:
-            with jsonl_path.open("r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                        source = str(Path(obj.get("source", "")))
-                        chunk_index = obj.get("chunk_index")
-                        chunk_hash = obj.get("chunk_hash")
-                        entries = obj.get("entries", [])
-                        success = obj.get("success", True)
-                        if source and chunk_index is not None and chunk_hash:
-                            if source not in processed:
-                                processed[source] = {}
-                            processed[source][chunk_index] = {
-                                "hash": chunk_hash,
-                                "entries": entries,
-                                "success": bool(success),
-                            }
-                    except json.JSONDecodeError:
-                        continue
-        except Exception:
-            return processed
-        return processed
-
     def _file_hash(text: str) -> str:
         return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
+    def _count_chars(text: str) -> tuple[int, int]:
+        """统计 (CJK 字符数, 其他字符数)"""
+        # 删掉所有 CJK 字符后的长度差即 CJK 字符数，逐字符扫描在正则引擎（C）中完成
+        other = len(_CJK_RUN_RE.sub("", text))
+        return len(text) - other, other
+
+    def _tokens_from_counts(cjk: int, other: int) -> int:
+        return cjk + math.ceil(other / 4)
+
     def _estimate_tokens(text: str) -> int:
         """
         粗略 token 估算：
@@ -117,56 +446,100 @@ def cmd_worldinfo(args):
         """
         if not text:
             return 0
-        cjk = 0
-        for ch in text:
-            code = ord(ch)
-            if (
-                0x4E00 <= code <= 0x9FFF  # CJK Unified Ideographs
-                or 0x3400 <= code <= 0x4DBF  # CJK Extension A
-                or 0x20000 <= code <= 0x2A6DF  # CJK Extension B
-                or 0x2A700 <= code <= 0x2B73F  # CJK Extension C
-                or 0x2B740 <= code <= 0x2B81F  # CJK Extension D
-                or 0x2B820 <= code <= 0x2CEAF  # CJK Extension E
-                or 0xF900 <= code <= 0xFAFF  # CJK Compatibility Ideographs
-            ):
-                cjk += 1
-        other = len(text) - cjk
-        return cjk + math.ceil(other / 4)
+        return _tokens_from_counts(*_count_chars(text))
 
-    def _estimate_messages_tokens(messages: list[dict]) -> int:
-        return sum(_estimate_tokens(m.get("content", "")) for m in messages)
+    @lru_cache(maxsize=None)
+    def _template_counts(template: str) -> tuple[int, int, int]:
+        """
+        模板静态部分的 (CJK 字符数, 其他字符数, {text} 出现次数)
+
+        各分块共用同一模板，只统计一次；format 后的字符数 = 静态部分 + 次数 × 分块文本
+        """
+        cjk, other = _count_chars(template.format(text=""))
+        slots = len(template.format(text="x")) - cjk - other
+        return cjk, other, slots
+
+    def _template_tokens(template: str, text_counts: tuple[int, int]) -> int:
+        """估算 template.format(text=...) 的 token 数，不实际拼接字符串"""
+        cjk, other, slots = _template_counts(template)
+        return _tokens_from_counts(cjk + slots * text_counts[0], other + slots * text_counts[1])
 
     def _estimate_file_tokens(text: str) -> dict:
-        # 构建主提示词（不含模型输出）
-        first_messages = extractor.build_prompt(text)
-        first_tokens = _estimate_messages_tokens(first_messages)
+        # 主提示词（不含模型输出）= system + user 模板；分块文本只扫描一次
+        text_counts = _count_chars(text)
+        system_tokens = _estimate_tokens(extractor.system_prompt)
+        user_tokens = _template_tokens(extractor.user_prompt_template, text_counts)
         total_calls = 1
-        total_tokens = first_tokens
+        total_tokens = system_tokens + user_tokens
 
-        # Gleaning 额外调用（不计入 assistant 输出长度，作为保守估计）
+        # Gleaning 额外调用：重复首次的 system + user，再加补漏模板
+        # （不计入 assistant 输出长度，作为保守估计）
         if extractor.enable_gleaning:
-            gleaning_messages = [
-                {"role": "system", "content": extractor.system_prompt},
-                {"role": "user", "content": extractor.user_prompt_template.format(text=text)},
-                {"role": "assistant", "content": ""},  # 估算不包含首次输出
-                {"role": "user", "content": extractor.gleaning_prompt_template.format(text=text)},
-            ]
             total_calls += 1
-            total_tokens += _estimate_messages_tokens(gleaning_messages)
+            total_tokens += (
+                system_tokens
+                + user_tokens
+                + _template_tokens(extractor.gleaning_prompt_template, text_counts)
+            )
 
         return {
             "calls": total_calls,
             "tokens": total_tokens,
         }
 
-    def _estimate_chunks_tokens(text: str) -> dict:
-        chunks = extractor._split_text(
-            text,
-            args.chunk_size,
-            args.overlap or 500,
-            strategy=args.chunk_strategy,
-            chapter_max_chars=args.chapter_max,
-        )
+    # 目录模式下已读取的文件文本（LRU，按 sys.getsizeof 计总内存，超出预算淘汰最久未用的）
+    # 估算、批处理预跑、逐块抽取读同一批文件，共用一次读取和解码的结果；
+    # 同一个 str 对象还能复用其内置哈希，切分缓存命中时也无需逐字比较
+    text_cache: OrderedDict[str, str] = OrderedDict()
+    text_cache_bytes = 0
+    text_cache_lock = threading.Lock()
+
+    def _read_text(path: Path) -> str:
+        """读取 UTF-8 文本文件（目录模式下多次读取同一文件时走缓存）"""
+        nonlocal text_cache_bytes
+        key = str(path)
+        with text_cache_lock:
+            text = text_cache.get(key)
+            if text is not None:
+                text_cache.move_to_end(key)
+                return text
+        text = path.read_bytes().decode("utf-8")
+        size = sys.getsizeof(text)
+        if size > _TEXT_CACHE_BYTES:
+            return text
+        with text_cache_lock:
+            if key not in text_cache:
+                text_cache[key] = text
+                text_cache_bytes += size
+                while text_cache_bytes > _TEXT_CACHE_BYTES:
+                    _, evicted = text_cache.popitem(last=False)
+                    text_cache_bytes -= sys.getsizeof(evicted)
+        return text
+
+    # 本次运行中每个文件的分块区间：{文件: (len(text), hash(text), [(start, end), ...])}
+    # 估算、批处理预跑、逐块抽取三处对同一文件切分，参数相同，只切一次；
+    # 只保存区间不保存文本，文件再多也不占多少内存，随本次运行结束释放
+    file_spans: dict[str, tuple[int, int, list[tuple[int, int]]]] = {}
+
+    def _split_chunks(text: str, file_key: str | None = None) -> list[str]:
+        """按命令行参数切分文本；给出 file_key 时复用该文件此前的切分结果"""
+        cached = file_spans.get(file_key) if file_key is not None else None
+        if cached is not None and cached[0] == len(text) and cached[1] == hash(text):
+            spans = cached[2]
+        else:
+            spans = extractor._split_spans(
+                text,
+                args.chunk_size,
+                args.overlap or 500,
+                strategy=args.chunk_strategy,
+                chapter_max_chars=args.chapter_max,
+            )
+            if file_key is not None:
+                file_spans[file_key] = (len(text), hash(text), spans)
+        return [text[start:end] for start, end in spans]
+
+    def _estimate_chunks_tokens(text: str, file_key: str | None = None) -> dict:
+        chunks = _split_chunks(text, file_key)
         total_calls = 0
         total_tokens = 0
         for chunk in chunks:
@@ -179,6 +552,133 @@ def cmd_worldinfo(args):
             "tokens": total_tokens,
         }
     
+    # 增量文件写入器和已处理 chunk 的 entries 读取器，在确定 args.output_jsonl 后创建
+    appender: JsonlAppender = None
+    entries_reader: ChunkEntriesReader = None
+
+    def _open_appender(jsonl_path: Path) -> JsonlAppender:
+        nonlocal appender, entries_reader
+        appender = JsonlAppender(jsonl_path)
+        entries_reader = ChunkEntriesReader(jsonl_path)
+        # 异常退出时也把缓冲中的记录写出，保证断点续跑
+        atexit.register(appender.close)
+        atexit.register(entries_reader.close)
+        return appender
+
+    def _append_chunk_record(payload: dict) -> None:
+        appender.append(payload)
+
+    # 同时进行的 chunk 抽取请求数（目录模式下所有文件共用一个 chunk 线程池）
+    max_concurrency = max(1, int(args.max_concurrency))
+
+    # 内容寻址：chunk 哈希 -> 已成功抽取的 chunk 记录（跨文件共享，entries 复用时才读取）
+    # 不同文件中逐字节相同的 chunk（序言、重复的前情提要等）只调用一次 LLM
+    entries_by_hash: dict[str, dict] = {}
+
+    def _index_by_hash(processed: dict) -> None:
+        """用增量文件中所有成功的 chunk 记录重建 entries_by_hash"""
+        entries_by_hash.clear()
+        for file_chunks in processed.values():
+            for info in file_chunks.values():
+                if info.get("success") and info.get("hash"):
+                    entries_by_hash[info["hash"]] = info
+
+    def _run_chunk(file_key: str, label: str, ci: int, chunk_count: int,
+                   chunk: str, chunk_hash: str) -> ExtractionResult:
+        """抽取单个 chunk（失败按 retry_max 重试），结果立即写入增量文件"""
+        max_retries = max(1, int(args.retry_max))
+        result = None
+        attempts_used = 0
+        for attempt in range(1, max_retries + 1):
+            attempts_used = attempt
+            print(f"     {label}chunk [{ci+1}/{chunk_count}] 抽取中... (尝试 {attempt}/{max_retries})")
+            # 重试时不读 LLM 缓存，否则每次拿到的都是同一份输出
+            result = extractor.extract(chunk, refresh_cache=attempt > 1)
+            if result.success:
+                break
+            print(f"     {label}chunk [{ci+1}/{chunk_count}] 抽取失败: {result.error}")
+        if result.success:
+            entries_by_hash[chunk_hash] = {"hash": chunk_hash, "entries": result.data, "success": True}
+
+        record = {
+            "source": file_key,
+            "chunk_index": ci,
+            "chunk_hash": chunk_hash,
+            "entries": result.data if result.success else [],
+            "success": result.success,
+            "attempts": attempts_used,
+        }
+        if not result.success:
+            record["error"] = result.error or "unknown error"
+        _append_chunk_record(record)
+        return result
+
+    def _extract_chunks(
+        chunk_pool: ThreadPoolExecutor,
+        file_key: str,
+        label: str,
+        chunks: list[str],
+        file_processed_chunks: dict,
+        chunk_hashes: list[str] | None = None,
+    ) -> tuple[list[ExtractionResult], int, int]:
+        """
+        抽取一个文件的所有 chunk（带 chunk 级别断点续跑）
+
+        哈希一致且成功的已处理 chunk 直接复用，不提交；其余提交到 chunk_pool 并发抽取。
+        chunk_hashes 为已算好的各 chunk 哈希（批处理预跑时已计算），避免重复哈希。
+        返回 (按 chunk 顺序排列的结果, 成功数, 跳过数)
+        """
+        chunk_count = len(chunks)
+        chunk_results: list[ExtractionResult] = [None] * chunk_count
+        if chunk_hashes is None or len(chunk_hashes) != chunk_count:
+            chunk_hashes = [_file_hash(chunk) for chunk in chunks]
+        skipped = 0
+        pending = {}
+        for ci, chunk in enumerate(chunks):
+            chunk_hash = chunk_hashes[ci]
+            cached = file_processed_chunks.get(ci)
+
+            # 检查是否已处理（哈希一致）
+            if cached and cached.get("hash") == chunk_hash and cached.get("success"):
+                chunk_results[ci] = ExtractionResult(
+                    success=True,
+                    data=entries_reader.entries(cached),
+                    source=f"{file_key}#chunk{ci}",
+                )
+                skipped += 1
+                print(f"     {label}chunk [{ci+1}/{chunk_count}] -> 已处理，跳过")
+                continue
+
+            # 其他位置（或其他文件）已抽取过相同内容：直接复用，仍写入记录以便续跑
+            reused_record = entries_by_hash.get(chunk_hash)
+            if reused_record is not None:
+                reused = entries_reader.entries(reused_record)
+                chunk_results[ci] = ExtractionResult(
+                    success=True,
+                    data=reused,
+                    source=f"{file_key}#chunk{ci}",
+                )
+                _append_chunk_record({
+                    "source": file_key,
+                    "chunk_index": ci,
+                    "chunk_hash": chunk_hash,
+                    "entries": reused,
+                    "success": True,
+                    "attempts": 0,
+                    "dedup": True,
+                })
+                skipped += 1
+                print(f"     {label}chunk [{ci+1}/{chunk_count}] -> 内容重复，复用已抽取结果")
+                continue
+
+            future = chunk_pool.submit(_run_chunk, file_key, label, ci, chunk_count, chunk, chunk_hash)
+            pending[future] = ci
+
+        for future in as_completed(pending):
+            chunk_results[pending[future]] = future.result()
+        success = sum(1 for ci in pending.values() if chunk_results[ci].success)
+        return chunk_results, success, skipped
+
     # 读取文件或目录
     input_path = Path(args.input_dir) if args.input_dir else Path(args.input)
     if not input_path.exists():
@@ -200,7 +700,10 @@ def cmd_worldinfo(args):
         print(f"   增量文件: {args.output_jsonl}")
 
         # 自动启用断点续跑（chunk 级别）
-        processed_chunks = _load_processed_chunks(Path(args.output_jsonl))
+        jsonl_path = Path(args.output_jsonl)
+        processed_chunks = _load_processed_chunks(jsonl_path)
+        _index_by_hash(processed_chunks)
+        _open_appender(jsonl_path)
         if processed_chunks:
             total_chunks_done = sum(len(v) for v in processed_chunks.values())
             print(f"   已检测到已处理: {len(processed_chunks)} 个文件, {total_chunks_done} 个 chunk")
@@ -209,15 +712,20 @@ def cmd_worldinfo(args):
             total_calls = 0
             total_tokens = 0
             total_files = len(md_files)
-            for idx, md_path in enumerate(md_files, start=1):
-                text = md_path.read_text(encoding="utf-8")
-                file_hash = _file_hash(text)
-                if processed_sources.get(str(md_path)) == file_hash:
-                    percent = int(idx / total_files * 100)
-                    print(f"   估算: [{idx}/{total_files} {percent}%] {md_path.name} -> 已处理，跳过")
-                    continue
+
+            def _estimate_one(md_path: Path) -> tuple[bool, dict]:
+                """读取并估算单个文件，返回 (是否分块, 估算结果)"""
+                text = _read_text(md_path)
                 if args.chunk_strategy != "fixed" or (args.chunk_size and len(text) > args.chunk_size):
-                    info = _estimate_chunks_tokens(text)
+                    return True, _estimate_chunks_tokens(text, str(md_path))
+                return False, _estimate_file_tokens(text)
+
+            # 各文件的读取和估算互相独立，按 --workers 并发；map 按原文件顺序返回结果
+            with ThreadPoolExecutor(max_workers=max(1, int(args.workers))) as pool:
+                estimates = list(pool.map(_estimate_one, md_files))
+
+            for idx, (md_path, (chunked, info)) in enumerate(zip(md_files, estimates), start=1):
+                if chunked:
                     total_calls += info["calls"]
                     total_tokens += info["tokens"]
                     percent = int(idx / total_files * 100)
@@ -225,7 +733,6 @@ def cmd_worldinfo(args):
                         f"   估算: [{idx}/{total_files} {percent}%] {md_path.name} -> chunks={info['chunks']}, calls≈{info['calls']}, tokens≈{info['tokens']}"
                     )
                 else:
-                    info = _estimate_file_tokens(text)
                     total_calls += info["calls"]
                     total_tokens += info["tokens"]
                     percent = int(idx / total_files * 100)
@@ -239,121 +746,110 @@ def cmd_worldinfo(args):
             if args.estimate_only:
                 return 0
 
-        results_all = []
-        any_failed = False
+        # 各文件的 chunk 哈希（批处理预跑时计算，逐块循环直接复用）
+        file_chunk_hashes: dict[str, list[str]] = {}
+
+        if args.batch:
+            # 批处理预跑：收集所有未处理的 chunk 一次提交，成功结果写入增量文件，
+            # 之后的逐块循环会把它们当作已处理跳过；失败的 chunk 仍走同步抽取重试
+            pending = []  # (file_key, chunk_index, chunk_hash, chunk)
+            pending_hashes = set()
+            for md_path in md_files:
+                text = _read_text(md_path)
+                file_processed_chunks = processed_chunks.get(str(md_path), {})
+                chunks = _split_chunks(text, str(md_path))
+                hashes = [_file_hash(chunk) for chunk in chunks]
+                file_chunk_hashes[str(md_path)] = hashes
+                for ci, chunk in enumerate(chunks):
+                    chunk_hash = hashes[ci]
+                    cached = file_processed_chunks.get(ci)
+                    if cached and cached.get("hash") == chunk_hash and cached.get("success"):
+                        continue
+                    # 已抽取过或本批已提交过的相同内容，由逐块循环复用
+                    if chunk_hash in entries_by_hash or chunk_hash in pending_hashes:
+                        continue
+                    pending_hashes.add(chunk_hash)
+                    pending.append((str(md_path), ci, chunk_hash, chunk))
+
+            if pending:
+                print(f"   批处理: 提交 {len(pending)} 个 chunk（Gleaning 补漏不在批处理中执行）")
+                batch_results = extractor.extract_batch([item[3] for item in pending])
+                batch_success = 0
+                for (file_key, ci, chunk_hash, _), result in zip(pending, batch_results):
+                    if not result.success:
+                        continue
+                    batch_success += 1
+                    appender.append({
+                        "source": file_key,
+                        "chunk_index": ci,
+                        "chunk_hash": chunk_hash,
+                        "entries": result.data,
+                        "success": True,
+                        "attempts": 1,
+                        "batch": True,
+                    })
+                print(f"   批处理完成: {batch_success}/{len(pending)} 成功，其余逐块重试")
+                appender.flush()
+                processed_chunks = _load_processed_chunks(jsonl_path)
+                _index_by_hash(processed_chunks)
+
         total_files = len(md_files)
-        for idx, md_path in enumerate(md_files, start=1):
-            text = md_path.read_text(encoding="utf-8")
+
+        def _process_file(idx: int, md_path: Path) -> ExtractionResult:
+            """抽取单个文件（chunk 级别断点续跑），返回该文件合并后的结果"""
+            text = _read_text(md_path)
             percent = int(idx / total_files * 100)
             print(f"   处理: [{idx}/{total_files} {percent}%] {md_path.name} ({len(text)} 字符)")
 
             # 分块处理（带 chunk 级别断点续跑）
-            chunks = extractor._split_text(
-                text,
-                args.chunk_size,
-                args.overlap or 500,
-                strategy=args.chunk_strategy,
-                chapter_max_chars=args.chapter_max,
-            )
+            chunks = _split_chunks(text, str(md_path))
             chunk_count = len(chunks)
             print(
-                f"   分块处理: 策略={args.chunk_strategy}, chunk_size={args.chunk_size}, chapter_max={args.chapter_max}，共 {chunk_count} 块"
+                f"   {md_path.name} 分块处理: 策略={args.chunk_strategy}, chunk_size={args.chunk_size}, chapter_max={args.chapter_max}，共 {chunk_count} 块"
             )
 
             file_key = str(md_path)
             file_processed_chunks = processed_chunks.get(file_key, {})
-            chunk_results = []
-            skipped = 0
-            success = 0
-
-            file_failed = False
-            for ci, chunk in enumerate(chunks):
-                chunk_hash = _file_hash(chunk)
-                cached = file_processed_chunks.get(ci)
-                
-                # 检查是否已处理（哈希一致）
-                if cached and cached.get("hash") == chunk_hash and cached.get("success"):
-                    # 从缓存恢复
-                    chunk_results.append(ExtractionResult(
-                        success=True,
-                        data=cached.get("entries", []),
-                        source=f"{md_path}#chunk{ci}",
-                    ))
-                    skipped += 1
-                    print(f"     chunk [{ci+1}/{chunk_count}] -> 已处理，跳过")
-                    continue
-
-                # 调用 LLM 抽取
-                max_retries = max(1, int(args.retry_max))
-                result = None
-                attempts_used = 0
-                for attempt in range(1, max_retries + 1):
-                    attempts_used = attempt
-                    print(f"     chunk [{ci+1}/{chunk_count}] 抽取中... (尝试 {attempt}/{max_retries})")
-                    result = extractor.extract(chunk)
-                    if result.success:
-                        break
-                    print(f"     chunk [{ci+1}/{chunk_count}] 抽取失败: {result.error}")
-                
-                if result.success:
-                    success += 1
-                    chunk_results.append(result)
-                    # 立即写入 jsonl（chunk 级别）
-                    _append_jsonl(
-                        Path(args.output_jsonl),
-                        {
-                            "source": file_key,
-                            "chunk_index": ci,
-                            "chunk_hash": chunk_hash,
-                            "entries": result.data,
-                            "success": True,
-                            "attempts": attempts_used,
-                        }
-                    )
-                else:
-                    file_failed = True
-                    chunk_results.append(result)
-                    _append_jsonl(
-                        Path(args.output_jsonl),
-                        {
-                            "source": file_key,
-                            "chunk_index": ci,
-                            "chunk_hash": chunk_hash,
-                            "entries": [],
-                            "success": False,
-                            "attempts": attempts_used,
-                            "error": result.error or "unknown error",
-                        }
-                    )
+            chunk_results, success, skipped = _extract_chunks(
+                chunk_pool, file_key, f"{md_path.name} ", chunks, file_processed_chunks,
+                file_chunk_hashes.get(file_key),
+            )
+            file_failed = success + skipped < chunk_count
 
-            print(f"   分块结果: {success} 成功, {skipped} 跳过, {chunk_count - success - skipped} 失败")
+            print(f"   {md_path.name} 分块结果: {success} 成功, {skipped} 跳过, {chunk_count - success - skipped} 失败")
 
             # 目录模式下避免对每个文件单独做 LLM 合并，留给全局合并处理
             if file_failed:
-                any_failed = True
                 print(f"   ⚠️ 文件存在失败 chunk，跳过该文件合并: {md_path}")
-                results_all.append(ExtractionResult(
+                return ExtractionResult(
                     success=False,
                     data=[],
                     source=str(md_path),
                     error="chunk_failed",
-                ))
-            else:
-                print(f"   合并中: {md_path.name} -> {len(chunk_results)} chunks")
-                if args.llm_merge:
-                    prev_merge = extractor.enable_llm_merge
-                    extractor.enable_llm_merge = False
-                    entries = extractor.merge_results(chunk_results)
-                    extractor.enable_llm_merge = prev_merge
-                else:
-                    entries = extractor.merge_results(chunk_results)
-                print(f"   合并完成: {md_path.name} -> {len(entries)} 条目")
+                )
+            print(f"   合并中: {md_path.name} -> {len(chunk_results)} chunks")
+            entries = extractor.merge_results(chunk_results, llm_merge=False)
+            print(f"   合并完成: {md_path.name} -> {len(entries)} 条目")
+            return ExtractionResult(
+                success=True,
+                data=entries,
+                source=str(md_path),
+            )
 
-                results_all.append(ExtractionResult(
-                    success=True,
-                    data=entries,
-                    source=str(md_path),
-                ))
+        # 各文件互相独立，按文件并发抽取；结果按原文件顺序放回
+        results_all: list[ExtractionResult] = [None] * total_files
+        workers = max(1, int(args.workers))
+        with ThreadPoolExecutor(max_workers=max_concurrency) as chunk_pool, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_process_file, idx, md_path): idx - 1
+                for idx, md_path in enumerate(md_files, start=1)
+            }
+            for future in as_completed(futures):
+                results_all[futures[future]] = future.result()
+        appender.close()
+        entries_reader.close()
+        any_failed = not all(result.success for result in results_all)
 
         # 目录模式合并所有文件（按文件顺序）
         if any_failed:
@@ -364,12 +860,12 @@ def cmd_worldinfo(args):
         print(f"✅ 最终合并完成: {len(entries)} 条目")
     else:
         # 文件模式
-        text = input_path.read_text(encoding="utf-8")
+        text = input_path.read_bytes().decode("utf-8")
         print(f"   文本长度: {len(text)} 字符")
 
         if args.estimate_tokens:
             if args.chunk_strategy != "fixed" or (args.chunk_size and len(text) > args.chunk_size):
-                info = _estimate_chunks_tokens(text)
+                info = _estimate_chunks_tokens(text, str(input_path))
                 print(
                     f"   估算: chunks={info['chunks']}, calls≈{info['calls']}, tokens≈{info['tokens']}"
                 )
@@ -390,87 +886,29 @@ def cmd_worldinfo(args):
         print(f"   增量文件: {args.output_jsonl}")
 
         # 加载已处理的 chunk
-        processed_chunks = _load_processed_chunks(Path(args.output_jsonl))
+        jsonl_path = Path(args.output_jsonl)
+        processed_chunks = _load_processed_chunks(jsonl_path)
         file_key = str(input_path)
         file_processed_chunks = processed_chunks.get(file_key, {})
         if file_processed_chunks:
             print(f"   已检测到已处理: {len(file_processed_chunks)} 个 chunk")
+        _index_by_hash(processed_chunks)
+        _open_appender(jsonl_path)
 
         # 执行抽取（chunk 级别断点续跑）
-        chunks = extractor._split_text(
-            text,
-            args.chunk_size,
-            args.overlap or 500,
-            strategy=args.chunk_strategy,
-            chapter_max_chars=args.chapter_max,
-        )
+        chunks = _split_chunks(text, file_key)
         chunk_count = len(chunks)
         print(
             f"   分块处理: 策略={args.chunk_strategy}, chunk_size={args.chunk_size}, chapter_max={args.chapter_max}，共 {chunk_count} 块"
         )
 
-        chunk_results = []
-        skipped = 0
-        success = 0
-
-        any_failed = False
-        for ci, chunk in enumerate(chunks):
-            chunk_hash = _file_hash(chunk)
-            cached = file_processed_chunks.get(ci)
-
-            # 检查是否已处理（哈希一致）
-            if cached and cached.get("hash") == chunk_hash and cached.get("success"):
-                chunk_results.append(ExtractionResult(
-                    success=True,
-                    data=cached.get("entries", []),
-                    source=f"{input_path}#chunk{ci}",
-                ))
-                skipped += 1
-                print(f"     chunk [{ci+1}/{chunk_count}] -> 已处理，跳过")
-                continue
-
-            # 调用 LLM 抽取
-            max_retries = max(1, int(args.retry_max))
-            result = None
-            attempts_used = 0
-            for attempt in range(1, max_retries + 1):
-                attempts_used = attempt
-                print(f"     chunk [{ci+1}/{chunk_count}] 抽取中... (尝试 {attempt}/{max_retries})")
-                result = extractor.extract(chunk)
-                if result.success:
-                    break
-                print(f"     chunk [{ci+1}/{chunk_count}] 抽取失败: {result.error}")
-
-            if result.success:
-                success += 1
-                chunk_results.append(result)
-                # 立即写入 jsonl（chunk 级别）
-                _append_jsonl(
-                    Path(args.output_jsonl),
-                    {
-                        "source": file_key,
-                        "chunk_index": ci,
-                        "chunk_hash": chunk_hash,
-                        "entries": result.data,
-                        "success": True,
-                        "attempts": attempts_used,
-                    }
-                )
-            else:
-                any_failed = True
-                chunk_results.append(result)
-                _append_jsonl(
-                    Path(args.output_jsonl),
-                    {
-                        "source": file_key,
-                        "chunk_index": ci,
-                        "chunk_hash": chunk_hash,
-                        "entries": [],
-                        "success": False,
-                        "attempts": attempts_used,
-                        "error": result.error or "unknown error",
-                    }
-                )
+        with ThreadPoolExecutor(max_workers=max_concurrency) as chunk_pool:
+            chunk_results, success, skipped = _extract_chunks(
+                chunk_pool, file_key, "", chunks, file_processed_chunks
+            )
+        appender.close()
+        entries_reader.close()
+        any_failed = success + skipped < chunk_count
 
         print(f"   分块结果: {success} 成功, {skipped} 跳过, {chunk_count - success - skipped} 失败")
         if any_failed:
@@ -485,15 +923,12 @@ def cmd_worldinfo(args):
     # 输出结果
     if args.output:
         output_path = Path(args.output)
-        output_path.write_text(
-            json.dumps(entries, ensure_ascii=False, indent=2),
-            encoding="utf-8"
-        )
+        _write_json(output_path, entries)
         print(f"   已保存到: {output_path}")
     else:
         # 打印到控制台
         print("\n" + "=" * 50)
-        print(json.dumps(entries, ensure_ascii=False, indent=2))
+        print(_format_json(entries))
     
     # 导入到数据库
     if args.import_db:
@@ -503,10 +938,15 @@ def cmd_worldinfo(args):
         config = get_config()
         store = SQLiteContentStore(config.database.content_path)
         
-        for entry in entries:
-            # 使用 name 作为数据库 ID，如果没有则用序号兜底
-            entry_id = entry.get("name") or f"wi_{input_path.stem}_{entries.index(entry)}"
-            store.save("world_info", entry_id, entry, tags=["extracted"])
+        # 使用 name 作为数据库 ID，如果没有则用序号兜底；整批在一个事务内写入
+        store.save_many(
+            "world_info",
+            (
+                (entry.get("name") or f"wi_{input_path.stem}_{i}", entry)
+                for i, entry in enumerate(entries)
+            ),
+            tags=["extracted"],
+        )
         
         print(f"   已导入到 content.db: {len(entries)} 个条目")
     
@@ -619,7 +1059,7 @@ def main():
     wi_parser.add_argument(
         "--output-jsonl",
         default=config.output_jsonl,
-        help="增量写入 JSONL（每个文件一行，防止进度丢失）",
+        help="增量写入 JSONL（每个文件一行，防止进度丢失）；同目录下的同名 .sqlite 为其续跑索引，清理时一并删除",
     )
     wi_parser.add_argument(
         "--resume",
@@ -627,6 +1067,35 @@ def main():
         default=config.resume,
         help="从 JSONL 断点续跑（跳过已处理文件）",
     )
+    wi_parser.add_argument(
+        "--batch",
+        action="store_true",
+        default=config.batch,
+        help="目录模式下先通过 OpenAI Batch API 批量提交所有 chunk（费用更低，最长 24 小时）",
+    )
+    wi_parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=config.max_concurrency,
+        help="同时进行的 chunk 抽取请求数（目录模式下所有文件共享），默认 4",
+    )
+    wi_parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.workers,
+        help="目录模式下并发处理的文件数，默认 4",
+    )
+    wi_parser.add_argument(
+        "--cache",
+        action="store_true",
+        default=config.cache_enabled,
+        help="缓存 LLM 响应（模型参数和提示词完全相同时复用上次的输出）",
+    )
+    wi_parser.add_argument(
+        "--cache-path",
+        default=config.cache_path,
+        help="LLM 响应缓存数据库路径，默认 data/llm_cache.db",
+    )
     wi_parser.add_argument(
         "--import-db",
         action="store_true",
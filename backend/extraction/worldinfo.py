@@ -26,7 +26,7 @@ import json
 import re
 from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 from .base import BaseExtractor
 
@@ -35,6 +35,11 @@ from .base import BaseExtractor
 PROMPTS_DIR = Path(__file__).parent / "prompts"
 DEFAULT_PROMPT_KIT = "xiuxian"
 
+# 提示词文件解析用的正则，模块加载时编译一次
+_PROMPT_TAG_RE = re.compile(r"<prompt>(.*)</prompt>", re.DOTALL)
+_XML_DECL_RE = re.compile(r"<\?xml[^>]*\?>")
+_XML_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+
 
 def _resolve_prompts_dir(prompts_dir: str | None) -> Path:
     """
@@ -72,12 +77,12 @@ def _extract_prompt_content(xml_content: str) -> str:
     保留内部的 XML 标签结构，只去掉外层 <prompt> 包装
     """
     # 匹配 <prompt>...</prompt> 内容
-    match = re.search(r"<prompt>(.*)</prompt>", xml_content, re.DOTALL)
+    match = _PROMPT_TAG_RE.search(xml_content)
     if match:
         return match.group(1).strip()
     # 如果没有 <prompt> 标签，返回去掉 XML 声明和注释后的内容
-    content = re.sub(r"<\?xml[^>]*\?>", "", xml_content)
-    content = re.sub(r"<!--.*?-->", "", content, flags=re.DOTALL)
+    content = _XML_DECL_RE.sub("", xml_content)
+    content = _XML_COMMENT_RE.sub("", content)
     return content.strip()
 
 
@@ -194,6 +199,15 @@ class WorldInfoExtractor(BaseExtractor):
         self.enable_gleaning = enable_gleaning
         self.enable_llm_merge = enable_llm_merge
     
+    def cache_salt(self) -> str:
+        """提示词和 Gleaning 开关都会影响抽取结果"""
+        prompts = "\x1f".join([
+            self.system_prompt,
+            self.user_prompt_template,
+            self.gleaning_prompt_template if self.enable_gleaning else "",
+        ])
+        return f"{super().cache_salt()}|{prompts}"
+    
     @staticmethod
     def _get_fallback_system_prompt() -> str:
         """内置默认系统提示词（XML 文件不存在时使用）"""
@@ -239,8 +253,7 @@ class WorldInfoExtractor(BaseExtractor):
             },
         ]
 
-        raw_output = self.llm.invoke(merge_prompt)
-        merged = self.parse_response(raw_output)
+        _, merged = self._invoke_and_parse(merge_prompt)
         return merged
     
     def build_prompt(self, text: str, **kwargs) -> list:
@@ -271,18 +284,19 @@ class WorldInfoExtractor(BaseExtractor):
                 {"role": "user", "content": self.gleaning_prompt_template.format(text=text)},
             ]
             
-            gleaning_output = self.llm.invoke(gleaning_prompt)
-            gleaning_data = self.parse_response(gleaning_output)
+            _, gleaning_data = self._invoke_and_parse(
+                gleaning_prompt, refresh_cache=kwargs.get("refresh_cache", False)
+            )
             
             if gleaning_data:
                 # 合并结果：Gleaning 的条目优先（可能是更完整的版本）
                 merged = self._merge_entries(result.data, gleaning_data)
                 result.data = merged
-                result.metadata["gleaning_added"] = len(gleaning_data)
+                result.add_metadata(gleaning_added=len(gleaning_data))
         
         except Exception as e:
             # Gleaning 失败不影响主结果
-            result.metadata["gleaning_error"] = str(e)
+            result.add_metadata(gleaning_error=str(e))
         
         return result
     
@@ -365,12 +379,21 @@ class WorldInfoExtractor(BaseExtractor):
         
         return unique_entries
     
-    def merge_results(self, results: list) -> list[dict]:
+    def _drop_exact_duplicates(self, entries: list[dict]) -> list[dict]:
+        """去掉主标识符和 content 都相同的重复条目（保留首次出现的）"""
+        unique = {}
+        for entry in entries:
+            unique.setdefault((self._get_primary_key(entry), entry.get("content", "")), entry)
+        return list(unique.values())
+    
+    def merge_results(self, results: list, llm_merge: Optional[bool] = None) -> list[dict]:
         """
         合并多个分块的抽取结果
         
         Args:
             results: extract_chunks 返回的结果列表
+            llm_merge: 是否做 LLM 合并，None 使用 enable_llm_merge
+                       （按次指定，不修改实例属性，可供多线程同时调用）
         
         Returns:
             去重合并后的条目列表
@@ -381,7 +404,11 @@ class WorldInfoExtractor(BaseExtractor):
                 all_entries.extend(result.data)
 
         # 可选：使用 LLM 做跨 chunk 合并/同名消歧（更稳，但会多一次调用）
-        if self.enable_llm_merge and len(results) > 1 and all_entries:
+        if llm_merge is None:
+            llm_merge = self.enable_llm_merge
+        if llm_merge and len(results) > 1 and all_entries:
+            # 相邻 chunk 的重叠部分常产出完全相同的条目，先在本地去掉，减少合并请求的输入
+            all_entries = self._drop_exact_duplicates(all_entries)
             try:
                 all_entries = self._llm_merge_entries(all_entries)
             except Exception as e:
@@ -27,6 +27,10 @@ class State(CommandState, RoleplayState, total=False):
     pass
 
 
+# /设定 的参数格式：键：值（全角或半角冒号）
+_SET_ARG_RE = re.compile(r'(\w+)[：:](.+)')
+
+
 def build_graph(checkpointer: BaseCheckpointSaver = None):
     """构建带指令的对话图"""
     tools = ChatTools()
@@ -42,7 +46,7 @@ def build_graph(checkpointer: BaseCheckpointSaver = None):
             arg = cmd.get("arg", "")
             
             if command == "设定":
-                match = re.match(r'(\w+)[：:](.+)', arg)
+                match = _SET_ARG_RE.match(arg)
                 if match:
                     key, value = match.groups()
                     key = key.strip()
@@ -55,7 +59,7 @@ def build_graph(checkpointer: BaseCheckpointSaver = None):
                         updates["scene"] = value
                         results.append(f"✓ 场景已设为：{value}")
                     elif key in ["名字", "name"]:
-                        char = state.get("character", {}).copy()
+                        char = dict(state.get("character") or {})
                         char["name"] = value
                         updates["character"] = char
                         results.append(f"✓ 角色名已设为：{value}")
@@ -17,6 +17,7 @@ LLM 输出格式（HTML 标签）:
 """
 import json
 import re
+from functools import lru_cache
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.base import BaseCheckpointSaver
 
@@ -337,14 +338,24 @@ def _match_keywords(search_text: str, extracted_keywords: list, entry_keys: list
     return False
 
 
+@lru_cache(maxsize=None)
+def _tag_re(tag: str) -> re.Pattern:
+    """<tag>...</tag> 的正则（按标签名缓存编译结果）"""
+    return re.compile(rf"<{tag}>(.*?)</{tag}>", re.DOTALL)
+
+
+# _strip_all_tags 使用的正则
+_PAIRED_TAG_RE = re.compile(r"<(\w+)>(.*?)</\1>", re.DOTALL)
+_ANY_TAG_RE = re.compile(r"</?[\w]+>")
+
+
 def _extract_tag(text: str, tag: str) -> str:
     """
     提取 HTML 标签内容
     
     示例: _extract_tag("<reply>你好</reply>", "reply") → "你好"
     """
-    pattern = rf"<{tag}>(.*?)</{tag}>"
-    match = re.search(pattern, text, re.DOTALL)
+    match = _tag_re(tag).search(text)
     if match:
         return match.group(1).strip()
     return ""
@@ -357,7 +368,7 @@ def _strip_all_tags(text: str) -> str:
     兜底用：当 LLM 没有按格式输出时
     """
     # 移除 <tag>...</tag> 格式，保留中间内容
-    result = re.sub(r"<(\w+)>(.*?)</\1>", r"\2", text, flags=re.DOTALL)
+    result = _PAIRED_TAG_RE.sub(r"\2", text)
     # 移除单独的标签
-    result = re.sub(r"</?[\w]+>", "", result)
+    result = _ANY_TAG_RE.sub("", result)
     return result.strip()
@@ -275,7 +275,7 @@ export const contents = {
      */
     async list(type, scope = 'global', tags = null) {
         let url = `/api/contents/${type}?scope=${scope}`;
-        if (tags) url += `&tags=${tags.join(',')}`;
+        if (tags) url += tags.map(t => `&tags=${encodeURIComponent(t)}`).join('');
         const data = await request(url);
         return data.items;
     },